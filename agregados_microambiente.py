@@ -0,0 +1,224 @@
+"""Agregado corrente da equipe de cada lider (empresa, codrodada, emailLider) em agregados_microambiente.
+
+Por questao: contagem e somas de PONTUACAO_IDEAL, PONTUACAO_REAL e GAP, e o
+histograma 6x6 das notas (ideal, real). Cada resposta nova de equipe aceita
+por /enviar-avaliacao e somada pela funcao somar_agregado_microambiente
+(sql/agregados_microambiente.sql), fora da requisicao e com retentativa; a
+funcao ignora uma resposta ja somada. Os relatorios saem do histograma em
+custo fixo, sem reler nem repontuar a equipe.
+
+Reconstrucao a partir de relatorios_microambiente:
+    python agregados_microambiente.py --codrodada r1 [--empresa x]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from pontuacao import NUMERO_QUESTOES, histograma_respostas, matriz_respostas, pontuar_histograma, pontuar_respostas
+
+TABELA = "agregados_microambiente"
+TABELA_RESPOSTAS = "relatorios_microambiente"
+# Respostas ja somadas: torna somar seguro de repetir
+TABELA_SOMADAS = "agregados_microambiente_somadas"
+FUNCAO_SOMAR = "rpc/somar_agregado_microambiente"
+TIPO_EQUIPE = "microambiente_equipe"
+CHAVE = ("empresa", "codrodada", "emailLider")
+TAMANHO_PAGINA = 1000
+TAMANHO_LOTE = 200
+# Colunas que bastam para comparar lideres (sem o histograma, 36x maior)
+COLUNAS_SOMAS = ("respondentes", "contagem", "soma_ideal", "soma_real", "soma_gap")
+# Funcao ausente (migracao nao aplicada): PGRST202 no PostgREST, 42883 no Postgres
+ERROS_FUNCAO_INDISPONIVEL = {"PGRST202", "42883", "42P01"}
+INTERVALO_NOVA_TENTATIVA = 600
+FUNCAO = {"indisponivel_ate": 0.0}
+
+log = logging.getLogger(__name__)
+
+
+def agregar_notas(indice, ideal, real, pontuacao=None):
+    """Agregado das respostas (notas int8, uma linha por respondente); `pontuacao` evita repontuar."""
+    if pontuacao is None:
+        pontuacao = pontuar_respostas(indice, ideal, real)
+    return {
+        "respondentes": pontuacao.respondentes,
+        "contagem": pontuacao.contagem.tolist(),
+        "soma_ideal": pontuacao.soma_ideal.tolist(),
+        "soma_real": pontuacao.soma_real.tolist(),
+        "soma_gap": pontuacao.soma_gap.tolist(),
+        "histograma": histograma_respostas(ideal, real).ravel().tolist()
+    }
+
+
+def pontuacao(indice, registro):
+    """PontuacaoEquipe de um registro de agregados_microambiente (pelo histograma, com a matriz atual)."""
+    return pontuar_histograma(indice, np.asarray(registro["histograma"]), registro.get("respondentes") or 0)
+
+
+def somar(cliente, empresa, codrodada, email_lider, email, agregado):
+    """Soma `agregado` (a resposta de `email`) ao registro do lider numa unica chamada atomica.
+
+    True se somou, False se essa resposta ja tinha sido somada e None se a
+    funcao nao existe no banco.
+    """
+    if time.monotonic() < FUNCAO["indisponivel_ate"]:
+        return None
+    resposta = cliente.post(FUNCAO_SOMAR, json={
+        "p_empresa": empresa,
+        "p_codrodada": codrodada,
+        "p_email_lider": email_lider,
+        "p_email": email,
+        **{f"p_{campo}": valor for campo, valor in agregado.items()}
+    })
+    if resposta.status_code >= 400:
+        try:
+            codigo = resposta.json().get("code")
+        except ValueError:
+            codigo = None
+        if codigo in ERROS_FUNCAO_INDISPONIVEL:
+            log.warning("Agregados indisponiveis (%s); aplique sql/agregados_microambiente.sql.", codigo)
+            FUNCAO["indisponivel_ate"] = time.monotonic() + INTERVALO_NOVA_TENTATIVA
+            return None
+    resposta.raise_for_status()
+    return resposta.json() is not False
+
+
+def buscar(cliente, empresa, codrodada, email_lider):
+    resposta = cliente.get(TABELA, params={
+        "empresa": f"eq.{empresa}",
+        "codrodada": f"eq.{codrodada}",
+        "emailLider": f"eq.{email_lider}",
+        "limit": 1
+    })
+    resposta.raise_for_status()
+    registros = resposta.json()
+    return registros[0] if registros else None
+
+
+def listar(cliente, codrodada, empresas, campos=COLUNAS_SOMAS, tamanho_pagina=TAMANHO_PAGINA):
+    """Registros da rodada nas `empresas`; pagina por emailLider, unico dentro de cada empresa."""
+    registros = []
+    for empresa in empresas:
+        params = {
+            "select": ",".join(("empresa", "emailLider") + tuple(campos)),
+            "codrodada": f"eq.{codrodada}",
+            "empresa": f"eq.{empresa}"
+        }
+        for pagina in cliente.paginar(TABELA, params, tamanho_pagina=tamanho_pagina, coluna="emailLider"):
+            registros.extend(pagina)
+    return registros
+
+
+def reconstruir(cliente, indice, codrodada, empresa=None, tamanho_pagina=TAMANHO_PAGINA, tamanho_lote=TAMANHO_LOTE):
+    """Recalcula os agregados da rodada a partir de relatorios_microambiente e regrava cada lider.
+
+    Vale a primeira resposta de cada email (como na consolidacao). Cada
+    resposta vira logo as 2x48 notas: a memoria cresce com os respondentes,
+    nao com o dados_json.
+    """
+    inicio = time.perf_counter()
+    params = {
+        "select": "id,empresa,codrodada,emailLider,email,dados_json,data_criacao",
+        "codrodada": f"eq.{codrodada}",
+        "tipo": f"eq.{TIPO_EQUIPE}",
+        "emailLider": "not.is.null"
+    }
+    if empresa:
+        params["empresa"] = f"eq.{empresa}"
+
+    # (empresa, codrodada, emailLider) -> email -> (data_criacao, ideal, real)
+    lideres = {}
+    lidas = 0
+    for pagina in cliente.paginar(TABELA_RESPOSTAS, params, tamanho_pagina=tamanho_pagina):
+        lidas += len(pagina)
+        ideal, real = matriz_respostas([linha.get("dados_json") or {} for linha in pagina])
+        for posicao, linha in enumerate(pagina):
+            chave = tuple(str(linha.get(coluna) or "").strip().lower() for coluna in CHAVE)
+            dados_json = linha.get("dados_json") or {}
+            email = (dados_json.get("email") or linha.get("email") or "").strip().lower()
+            if not email or not chave[2]:
+                continue
+            respostas = lideres.setdefault(chave, {})
+            data_criacao = linha.get("data_criacao") or ""
+            if email not in respostas or data_criacao < respostas[email][0]:
+                respostas[email] = (data_criacao, ideal[posicao], real[posicao])
+
+    atualizado_em = datetime.now(timezone.utc).isoformat()
+    registros = []
+    somadas = []
+    for (empresa_lider, codrodada_lider, email_lider), respostas in sorted(lideres.items()):
+        somadas.extend({"empresa": empresa_lider, "codrodada": codrodada_lider, "emailLider": email_lider, "email": email}
+                       for email in respostas)
+        ideal = np.array([notas for _, notas, _ in respostas.values()], dtype=np.int8).reshape(-1, NUMERO_QUESTOES)
+        real = np.array([notas for _, _, notas in respostas.values()], dtype=np.int8).reshape(-1, NUMERO_QUESTOES)
+        registros.append({
+            "empresa": empresa_lider,
+            "codrodada": codrodada_lider,
+            "emailLider": email_lider,
+            **agregar_notas(indice, ideal, real),
+            "atualizado_em": atualizado_em
+        })
+
+    for posicao in range(0, len(registros), tamanho_lote):
+        resposta = cliente.post(
+            TABELA,
+            params={"on_conflict": ",".join(CHAVE)},
+            json=registros[posicao:posicao + tamanho_lote],
+            headers={"Prefer": "resolution=merge-duplicates,return=minimal"}
+        )
+        resposta.raise_for_status()
+    # Uma soma ainda na fila do servico para uma resposta ja contada aqui vira no-op
+    for posicao in range(0, len(somadas), tamanho_lote):
+        resposta = cliente.post(
+            TABELA_SOMADAS,
+            params={"on_conflict": ",".join(CHAVE + ("email",))},
+            json=somadas[posicao:posicao + tamanho_lote],
+            headers={"Prefer": "resolution=ignore-duplicates,return=minimal"}
+        )
+        resposta.raise_for_status()
+
+    resumo = {
+        "codrodada": codrodada,
+        "empresa": empresa,
+        "respostas_lidas": lidas,
+        "lideres": len(registros),
+        "respondentes": sum(r["respondentes"] for r in registros),
+        "duracao_segundos": round(time.perf_counter() - inicio, 3)
+    }
+    log.info("Agregados reconstruidos: %s lider(es)", resumo["lideres"], extra={"campos": resumo})
+    return resumo
+
+
+def main():
+    import log_estruturado
+    import planilhas_referencia
+    from pontuacao import IndicePontuacao
+    from supabase_rest import ClienteSupabase
+
+    log_estruturado.configurar()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codrodada", required=True)
+    parser.add_argument("--empresa")
+    args = parser.parse_args()
+
+    cliente = ClienteSupabase(
+        os.environ.get("SUPABASE_RESPOSTAS_REST_URL") or os.environ.get("SUPABASE_REST_URL"),
+        os.environ.get("SUPABASE_RESPOSTAS_KEY") or os.environ.get("SUPABASE_KEY")
+    )
+    if not cliente.configurado():
+        sys.exit("Defina SUPABASE_RESPOSTAS_REST_URL e SUPABASE_RESPOSTAS_KEY.")
+    planilhas = planilhas_referencia.carregar()
+    indice = IndicePontuacao(planilhas["matriz"], planilhas["dimensao"], planilhas["subdimensao"])
+    resumo = reconstruir(cliente, indice, args.codrodada.strip().lower(),
+                         empresa=(args.empresa or "").strip().lower() or None)
+    print(json.dumps(resumo, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Armazem local de artefatos renderizados (PNG/PDF) enderecados pelo hash da receita, com despejo LRU por tamanho."""
+import hashlib
+import json
+import os
+import re
+import threading
+
+import metricas_prometheus
+
+TAMANHO_MAXIMO_PADRAO = 512 * 1024 * 1024
+# Ao estourar o limite, despeja ate sobrar esta fracao (evita varrer o disco a cada gravacao)
+FRACAO_APOS_DESPEJO = 0.9
+NOME_VALIDO = re.compile(r"^[0-9a-f]{64}\.(png|pdf)$")
+TIPOS_MIME = {"png": "image/png", "pdf": "application/pdf"}
+
+
+def chave(receita):
+    bruto = json.dumps(receita, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class ArmazemArtefatos:
+    def __init__(self, diretorio, tamanho_maximo_bytes=TAMANHO_MAXIMO_PADRAO):
+        self.diretorio = diretorio
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self._trava = threading.Lock()
+        self._tamanho_total = None
+        self.acertos = 0
+        self.geracoes = 0
+        self.despejos = 0
+
+    def caminho(self, nome):
+        if not NOME_VALIDO.match(nome):
+            raise ValueError(f"Nome de artefato invalido: {nome}")
+        return os.path.join(self.diretorio, nome[:2], nome)
+
+    def ler(self, nome):
+        """Bytes do artefato (e marca o uso para o LRU), ou None se nao estiver em disco."""
+        caminho = self.caminho(nome)
+        try:
+            with open(caminho, "rb") as arquivo:
+                conteudo = arquivo.read()
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        return conteudo
+
+    def obter_ou_gerar(self, extensao, receita, produzir):
+        """Devolve (nome, bytes). `produzir()` so roda se nenhuma receita identica estiver em disco."""
+        nome = f"{chave(receita)}.{extensao}"
+        conteudo = self.ler(nome)
+        if conteudo is not None:
+            with self._trava:
+                self.acertos += 1
+            metricas_prometheus.CACHE_CONSULTAS.labels("artefatos", "acerto").inc()
+            return nome, conteudo
+
+        metricas_prometheus.CACHE_CONSULTAS.labels("artefatos", "falha").inc()
+        conteudo = produzir()
+        caminho = self.caminho(nome)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+
+        with self._trava:
+            self.geracoes += 1
+            if self._tamanho_total is None:
+                self._tamanho_total = sum(tamanho for _, tamanho, _ in self._arquivos())
+            else:
+                self._tamanho_total += len(conteudo)
+            if self._tamanho_total > self.tamanho_maximo_bytes:
+                self._despejar()
+        return nome, conteudo
+
+    def _arquivos(self):
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if not NOME_VALIDO.match(nome):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    estado = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                yield caminho, estado.st_size, estado.st_mtime
+
+    def _despejar(self):
+        # Varre o disco (outros workers tambem gravam aqui) e remove os menos usados
+        arquivos = sorted(self._arquivos(), key=lambda item: item[2])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        alvo = self.tamanho_maximo_bytes * FRACAO_APOS_DESPEJO
+        for caminho, tamanho, _ in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            self.despejos += 1
+        self._tamanho_total = total
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                "diretorio": self.diretorio,
+                "tamanho_maximo_bytes": self.tamanho_maximo_bytes,
+                "tamanho_total_bytes": self._tamanho_total,
+                "acertos": self.acertos,
+                "geracoes": self.geracoes,
+                "despejos": self.despejos
+            }
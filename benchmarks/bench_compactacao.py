@@ -0,0 +1,76 @@
+"""Compactacao de relatorios_gerados contra o PostgREST em memoria: tempo, linhas e bytes liberados.
+
+Uso:
+    python benchmarks/bench_compactacao.py [--chaves 500] [--versoes 20] [--manter 1] [--imagem-kb 60]
+
+Monta um historico sintetico (varias versoes por chave, com uma imagem base64
+no dados_json), roda a compactacao simulada e a real e confere que ficaram
+exatamente as `manter` versoes mais novas de cada chave; sai com codigo 1 se nao.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import compactacao_relatorios  # noqa: E402
+import postgrest_falso  # noqa: E402
+from supabase_rest import ClienteSupabase  # noqa: E402
+
+
+def gerar_historico(chaves, versoes, imagem_kb):
+    inicio = datetime(2026, 1, 1)
+    imagem = "data:image/png;base64," + "A" * (imagem_kb * 1024)
+    linhas = []
+    # Versoes intercaladas entre as chaves, como as regeracoes ao longo do tempo
+    for versao in range(versoes):
+        for indice in range(chaves):
+            linhas.append({
+                "empresa": "bench",
+                "codrodada": "r1",
+                "emaillider": f"lider{indice}@bench.test",
+                "tipo_relatorio": "microambiente_termometro_gaps",
+                "data_criacao": (inicio + timedelta(minutes=versao * chaves + indice)).isoformat(),
+                "dados_json": {"versao": versao, "imagemBase64": imagem}
+            })
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chaves", type=int, default=500)
+    parser.add_argument("--versoes", type=int, default=20)
+    parser.add_argument("--manter", type=int, default=1)
+    parser.add_argument("--imagem-kb", type=int, default=60)
+    args = parser.parse_args()
+
+    banco = postgrest_falso.PostgrestFalso()
+    postgrest_falso.instalar(banco)
+    cliente = ClienteSupabase("http://postgrest.bench/rest/v1", "bench")
+    banco.carregar("relatorios_gerados", gerar_historico(args.chaves, args.versoes, args.imagem_kb))
+
+    for simular in (True, False):
+        inicio = time.perf_counter()
+        resumo = compactacao_relatorios.compactar(cliente, manter=args.manter, simular=simular)
+        print(f"{'simulada' if simular else 'real':>8}: {resumo['linhas_removidas']} de {resumo['linhas_lidas']} linhas,"
+              f" {resumo['bytes_liberados'] / 1024 / 1024:.1f} MB em {resumo['lotes']} lotes,"
+              f" {time.perf_counter() - inicio:.2f}s")
+
+    restantes = banco.linhas("relatorios_gerados")
+    esperadas = set(range(max(args.versoes - args.manter, 0), args.versoes))
+    por_chave = {}
+    for linha in restantes:
+        por_chave.setdefault(linha["emaillider"], set()).add(linha["dados_json"]["versao"])
+    erradas = [chave for chave, versoes in por_chave.items() if versoes != esperadas]
+    if len(por_chave) != args.chaves or erradas:
+        print(f"ERRO: {len(erradas)} chave(s) com versoes erradas, {len(por_chave)} de {args.chaves} chaves restantes")
+        sys.exit(1)
+    print(f"OK: {len(restantes)} linhas, as {args.manter} versoes mais novas de cada uma das {args.chaves} chaves")
+
+
+if __name__ == "__main__":
+    main()
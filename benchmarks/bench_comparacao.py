@@ -0,0 +1,120 @@
+"""Comparacao entre lideres a partir dos agregados: tempo de leitura e de calculo para milhares de lideres.
+
+Uso:
+    python benchmarks/bench_comparacao.py [--lideres 5000] [--empresas 4] [--repeticoes 5]
+
+Gera agregados sinteticos (equipes de 3 a 40 respondentes), carrega no
+PostgREST em memoria, le como a rota e cronometra comparacao_lideres.comparar.
+Confere uma amostra de lideres contra os relatorios de equipe
+(PontuacaoEquipe) e sai com codigo 1 se algum numero divergir.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import agregados_microambiente  # noqa: E402
+import comparacao_lideres  # noqa: E402
+import planilhas_referencia  # noqa: E402
+import postgrest_falso  # noqa: E402
+from pontuacao import NUMERO_QUESTOES, IndicePontuacao, PontuacaoEquipe  # noqa: E402
+from supabase_rest import ClienteSupabase  # noqa: E402
+
+AMOSTRA = 20
+
+
+def gerar_agregados(indice, lideres, empresas, semente=42):
+    aleatorio = np.random.default_rng(semente)
+    registros = []
+    for posicao in range(lideres):
+        tamanho = int(aleatorio.integers(3, 41))
+        # Cada lider com um vies proprio, para a distribuicao nao ficar achatada
+        pesos = aleatorio.dirichlet(np.ones(6) * 2)
+        ideal = aleatorio.choice(np.arange(1, 7, dtype=np.int8), size=(tamanho, NUMERO_QUESTOES), p=pesos)
+        real = aleatorio.choice(np.arange(1, 7, dtype=np.int8), size=(tamanho, NUMERO_QUESTOES), p=pesos[::-1])
+        real[aleatorio.random(real.shape) < 0.01] = 0
+        registros.append({
+            "empresa": f"empresa{posicao % empresas}",
+            "codrodada": "r1",
+            "emailLider": f"lider{posicao}@bench.test",
+            **agregados_microambiente.agregar_notas(indice, ideal, real)
+        })
+    return registros
+
+
+def conferir(indice, registros, comparacao):
+    """Diferencas entre a comparacao e os relatorios de equipe de uma amostra de lideres."""
+    por_email = {lider["emailLider"]: lider for lider in comparacao["lideres"]}
+    erros = []
+    for registro in random.Random(7).sample(registros, min(AMOSTRA, len(registros))):
+        equipe = PontuacaoEquipe(indice, registro["contagem"], registro["soma_ideal"], registro["soma_real"],
+                                 registro["soma_gap"], registro["respondentes"])
+        lider = por_email[registro["emailLider"]]
+        esperado = {linha["DIMENSAO"]: linha for linha in equipe.percentuais_por_dimensao()}
+        gaps = {linha["DIMENSAO"]: linha["GAP"] for linha in equipe.gaps_por_dimensao()}
+        for g, dimensao in enumerate(comparacao["dimensoes"]):
+            nome = dimensao["DIMENSAO"]
+            ideal, real, gap = (lider["dimensoes"][metrica][g] for metrica in ("IDEAL_%", "REAL_%", "GAP"))
+            if (gap is None) != (nome not in gaps):
+                erros.append((registro["emailLider"], nome, "presenca"))
+                continue
+            # Somas em outra ordem: o arredondamento de um empate pode cair na outra casa
+            if nome in esperado and (abs(ideal - esperado[nome]["IDEAL_%"]) > 0.1 + 1e-9
+                                     or abs(real - esperado[nome]["REAL_%"]) > 0.1 + 1e-9):
+                erros.append((registro["emailLider"], nome, "percentual"))
+            if gap is not None and abs(gap - gaps[nome]) > 1e-9:
+                erros.append((registro["emailLider"], nome, "GAP"))
+    return erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lideres", type=int, default=5000)
+    parser.add_argument("--empresas", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    planilhas = planilhas_referencia.carregar()
+    indice = IndicePontuacao(planilhas["matriz"], planilhas["dimensao"], planilhas["subdimensao"])
+
+    inicio = time.perf_counter()
+    registros = gerar_agregados(indice, args.lideres, args.empresas)
+    print(f"{args.lideres} lideres gerados em {time.perf_counter() - inicio:.2f}s")
+
+    banco = postgrest_falso.PostgrestFalso()
+    postgrest_falso.instalar(banco)
+    banco.carregar(agregados_microambiente.TABELA, registros)
+    cliente = ClienteSupabase("http://postgrest.bench/rest/v1", "bench")
+    empresas = [f"empresa{i}" for i in range(args.empresas)]
+
+    inicio = time.perf_counter()
+    lidos = agregados_microambiente.listar(cliente, "r1", empresas)
+    print(f"leitura (PostgREST em memoria): {len(lidos)} lideres em {time.perf_counter() - inicio:.2f}s")
+
+    tempos = []
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter()
+        comparacao = comparacao_lideres.comparar(indice, lidos)
+        tempos.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    comparacao_lideres.comparar(indice, lidos, email_lider=lidos[0]["emailLider"])
+    um_lider = time.perf_counter() - inicio
+    print(f"comparacao: mediana {np.median(tempos) * 1000:.1f} ms com todos os lideres na resposta,"
+          f" {um_lider * 1000:.1f} ms com um lider")
+
+    erros = conferir(indice, lidos, comparacao)
+    if erros:
+        print(f"ERRO: {len(erros)} divergencia(s) com os relatorios de equipe, por exemplo {erros[:3]}")
+        sys.exit(1)
+    print(f"OK: {min(AMOSTRA, len(lidos))} lideres conferidos com os relatorios de equipe")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Custo de pontuacao por equipe: varredura da matriz, indice denso, motor vetorizado e vetores gravados no envio.
+
+Uso: python benchmarks/bench_pontuacao.py
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from pontuacao import (  # noqa: E402
+    CAMPO_VETOR, MAPEAMENTO_QUESTOES, IndicePontuacao, matriz_respostas, pontuar_equipe, pontuar_respostas,
+    vetor_pontuado
+)
+
+TAMANHOS_EQUIPE = [1, 10, 100, 1000]
+LIMITE_VARREDURA = 100
+
+
+def gerar_equipe(tamanho, semente=42):
+    aleatorio = random.Random(semente)
+    equipe = []
+    for _ in range(tamanho):
+        avaliacao = {}
+        for campo in MAPEAMENTO_QUESTOES.values():
+            avaliacao[f"{campo}C"] = str(aleatorio.randint(1, 6))
+            avaliacao[f"{campo}k"] = str(aleatorio.randint(1, 6))
+        equipe.append(avaliacao)
+    return equipe
+
+
+def _notas(av, q):
+    campo = MAPEAMENTO_QUESTOES[q]
+    return int(av[f"{campo}k"]), int(av[f"{campo}C"])
+
+
+def pontuar_varrendo_matriz(matriz, equipe):
+    total = 0.0
+    for i in range(1, 49):
+        q = f"Q{i:02d}"
+        for av in equipe:
+            ideal, real = _notas(av, q)
+            linha = matriz[matriz["CHAVE"] == f"{q}_I{ideal}_R{real}"]
+            if not linha.empty:
+                total += float(linha.iloc[0]["PONTUACAO_IDEAL"])
+                total += float(linha.iloc[0]["PONTUACAO_REAL"])
+                total += float(linha.iloc[0]["GAP"])
+    return total
+
+
+def pontuar_com_indice(indice, equipe):
+    total = 0.0
+    for i in range(1, 49):
+        q = f"Q{i:02d}"
+        for av in equipe:
+            pontos = indice.buscar(q, *_notas(av, q))
+            if pontos is not None:
+                total += sum(pontos)
+    return total
+
+
+def pontuar_com_motor(indice, equipe):
+    resultado = pontuar_equipe(indice, equipe)
+    return float((resultado.soma_ideal + resultado.soma_real + resultado.soma_gap).sum())
+
+
+def pontuar_no_envio(indice, equipe):
+    # O que /enviar-avaliacao grava em cada resposta
+    pontuadas = []
+    for av in equipe:
+        ideal, real = matriz_respostas([av])
+        pontuadas.append({**av, CAMPO_VETOR: vetor_pontuado(pontuar_respostas(indice, ideal, real))})
+    return pontuadas
+
+
+def cronometrar(funcao, *args, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    os.chdir(RAIZ)
+    matriz = pd.read_excel("TABELA_GERAL_MICROAMBIENTE_COM_CHAVE.xlsx")
+    dimensao = pd.read_excel("pontos_maximos_dimensao.xlsx")
+    subdimensao = pd.read_excel("pontos_maximos_subdimensao.xlsx")
+
+    inicio = time.perf_counter()
+    indice = IndicePontuacao(matriz, dimensao, subdimensao)
+    print(f"montagem do indice: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    print(f"{'respondentes':>12} {'varredura (ms)':>15} {'indice (ms)':>12} {'motor (ms)':>11} {'vetores (ms)':>13}")
+    for tamanho in TAMANHOS_EQUIPE:
+        equipe = gerar_equipe(tamanho)
+        referencia = pontuar_com_indice(indice, equipe)
+        pontuadas = pontuar_no_envio(indice, equipe)
+        assert abs(pontuar_com_motor(indice, equipe) - referencia) < 1e-6 * max(1.0, abs(referencia))
+        assert abs(pontuar_com_motor(indice, pontuadas) - referencia) < 1e-6 * max(1.0, abs(referencia))
+        if tamanho <= LIMITE_VARREDURA:
+            assert abs(pontuar_varrendo_matriz(matriz, equipe) - referencia) < 1e-6 * max(1.0, abs(referencia))
+            varredura = f"{cronometrar(pontuar_varrendo_matriz, matriz, equipe, repeticoes=1) * 1000:>15.2f}"
+        else:
+            varredura = f"{'-':>15}"
+        com_indice = cronometrar(pontuar_com_indice, indice, equipe)
+        com_motor = cronometrar(pontuar_com_motor, indice, equipe)
+        com_vetores = cronometrar(pontuar_com_motor, indice, pontuadas)
+        print(f"{tamanho:>12} {varredura} {com_indice * 1000:>12.3f} {com_motor * 1000:>11.3f} {com_vetores * 1000:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Tempo das rotas de pontuacao pelo test client do Flask, com o Supabase num PostgREST em memoria.
+
+Uso:
+    python benchmarks/bench_rotas.py [--saida bench_rotas.json] [--tamanhos 1,10,100,1000]
+                                     [--repeticoes 5] [--comparar anterior.json --tolerancia 0.25]
+
+Cenarios: "frio" (sem relatorio gerado, caches em memoria e armazem de
+artefatos vazios) e "quente" (relatorio ainda valido). O JSON de saida guarda
+mediana, p95 e chamadas ao PostgREST por requisicao. Com --comparar, sai com
+codigo 1 se alguma mediana piorar mais que a tolerancia.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TAMANHOS_EQUIPE = [1, 10, 100, 1000]
+REPETICOES = 5
+EMPRESA, CODRODADA, EMAIL_LIDER = "bench", "r1", "lider@bench.test"
+
+# (rota, cenarios); as de salvar-grafico-* e analiticos reaproveitam relatorio valido no "quente"
+ROTAS = [
+    ("/salvar-grafico-autoavaliacao", ("frio", "quente")),
+    ("/salvar-grafico-autoavaliacao-subdimensao", ("frio", "quente")),
+    ("/salvar-grafico-media-equipe-dimensao", ("frio", "quente")),
+    ("/salvar-grafico-media-equipe-subdimensao", ("frio", "quente")),
+    ("/salvar-grafico-waterfall-gaps", ("frio", "quente")),
+    ("/salvar-grafico-termometro-gaps", ("frio", "quente")),
+    ("/relatorio-analitico-microambiente-supabase", ("frio",)),
+    ("/gerar-relatorios-equipe-microambiente", ("frio", "quente")),
+    ("/grafico-autoavaliacao", ("frio",)),
+    # Por ultimo: regrava o consolidado (nova versao dos dados)
+    ("/salvar-consolidado-microambiente", ("frio",)),
+]
+
+
+def _nota(aleatorio):
+    # Respostas reais pesam para o alto da escala; de vez em quando vem vazia ou com espaco
+    sorteio = aleatorio.random()
+    if sorteio < 0.01:
+        return ""
+    if sorteio < 0.02:
+        return f" {aleatorio.randint(1, 6)} "
+    return str(aleatorio.choices(range(1, 7), weights=(3, 5, 10, 20, 30, 32))[0])
+
+
+def gerar_avaliacao(aleatorio, tipo, indice):
+    avaliacao = {
+        "empresa": EMPRESA,
+        "codrodada": CODRODADA,
+        "emailLider": EMAIL_LIDER,
+        "tipo": tipo,
+        "nome": f"Pessoa {indice}",
+        "email": f"pessoa{indice}@bench.test",
+        "departamento": aleatorio.choice(["Vendas", "Operacoes", "RH", "TI"]),
+        "cargo": aleatorio.choice(["Analista", "Coordenador", "Assistente"]),
+        "data": "01/01/2026"
+    }
+    for numero in range(1, 49):
+        avaliacao[f"Q{numero:02d}C"] = _nota(aleatorio)
+        avaliacao[f"Q{numero:02d}k"] = _nota(aleatorio)
+    return avaliacao
+
+
+def gerar_equipe(tamanho, semente=42):
+    aleatorio = random.Random(semente + tamanho)
+    autoavaliacao = gerar_avaliacao(aleatorio, "microambiente_autoavaliacao", 0)
+    equipe = [gerar_avaliacao(aleatorio, "microambiente_equipe", i) for i in range(1, tamanho + 1)]
+    return autoavaliacao, equipe
+
+
+def popular(banco, autoavaliacao, equipe):
+    criacao = "2026-01-01T00:00:00"
+    banco.carregar("relatorios_microambiente", [
+        {"empresa": EMPRESA, "codrodada": CODRODADA, "emailLider": EMAIL_LIDER, "tipo": avaliacao["tipo"],
+         "email": avaliacao["email"], "dados_json": avaliacao, "data_criacao": criacao}
+        for avaliacao in [autoavaliacao] + equipe
+    ])
+    banco.carregar("consolidado_microambiente", [{
+        "empresa": EMPRESA, "codrodada": CODRODADA, "emaillider": EMAIL_LIDER, "data_criacao": criacao,
+        "dados_json": {"autoavaliacao": autoavaliacao, "avaliacoesEquipe": equipe}
+    }])
+    banco.limpar("relatorios_gerados")
+
+
+def _percentil(ordenadas, fracao):
+    return ordenadas[min(len(ordenadas) - 1, int(round(fracao * (len(ordenadas) - 1))))]
+
+
+class Bancada:
+    def __init__(self, app_modulo, banco, diretorio):
+        self.app = app_modulo
+        self.banco = banco
+        self.diretorio = diretorio
+        self.cliente = app_modulo.app.test_client()
+        self._armazens = 0
+
+    def esperar_gravacoes(self):
+        while self.app.FILA_GRAVACOES.pendentes():
+            time.sleep(0.005)
+
+    def esfriar(self):
+        from artefatos import ArmazemArtefatos
+
+        self.esperar_gravacoes()
+        self.banco.limpar("relatorios_gerados")
+        self.app.CACHE_RELATORIOS.limpar()
+        self.app.VERSOES_DADOS.limpar()
+        self._armazens += 1
+        self.app.ARTEFATOS = ArmazemArtefatos(os.path.join(self.diretorio, f"artefatos-{self._armazens}"))
+
+    def chamar(self, rota, autoavaliacao):
+        corpo = {"empresa": EMPRESA, "codrodada": CODRODADA, "emailLider": EMAIL_LIDER}
+        if rota == "/grafico-autoavaliacao":
+            arquivo = io.BytesIO(json.dumps({"autoavaliacao": autoavaliacao}).encode("utf-8"))
+            return self.cliente.post(rota, data={"arquivo_json": (arquivo, "auto.json")},
+                                     content_type="multipart/form-data")
+        return self.cliente.post(rota, json=corpo)
+
+    def medir(self, rota, cenario, autoavaliacao, repeticoes):
+        if cenario == "quente":
+            self.esfriar()
+            self.chamar(rota, autoavaliacao)
+            self.esperar_gravacoes()
+
+        tempos, status, chamadas = [], set(), 0
+        for _ in range(repeticoes):
+            if cenario == "frio":
+                self.esfriar()
+            antes = sum(self.banco.chamadas.values())
+            inicio = time.perf_counter()
+            resposta = self.chamar(rota, autoavaliacao)
+            tempos.append(time.perf_counter() - inicio)
+            chamadas += sum(self.banco.chamadas.values()) - antes
+            status.add(resposta.status_code)
+        self.esperar_gravacoes()
+
+        ordenados = sorted(tempos)
+        return {
+            "rota": rota,
+            "cenario": cenario,
+            "repeticoes": repeticoes,
+            "status": sorted(status),
+            "min_ms": round(ordenados[0] * 1000, 3),
+            "mediana_ms": round(_percentil(ordenados, 0.5) * 1000, 3),
+            "p95_ms": round(_percentil(ordenados, 0.95) * 1000, 3),
+            "max_ms": round(ordenados[-1] * 1000, 3),
+            "chamadas_postgrest": round(chamadas / repeticoes, 2)
+        }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior, atual, tolerancia):
+    """Lista as medianas que pioraram mais que `tolerancia` (fracao) em relacao a `anterior`."""
+    chave = lambda r: (r["rota"], r["respondentes"], r["cenario"])  # noqa: E731
+    base = {chave(r): r for r in anterior["resultados"]}
+    regressoes = []
+    for resultado in atual["resultados"]:
+        referencia = base.get(chave(resultado))
+        if referencia is None or not referencia["mediana_ms"]:
+            continue
+        razao = resultado["mediana_ms"] / referencia["mediana_ms"]
+        if razao > 1 + tolerancia:
+            regressoes.append((*chave(resultado), referencia["mediana_ms"], resultado["mediana_ms"], razao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--saida", default="bench_rotas.json")
+    parser.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS_EQUIPE)))
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--rotas", default="", help="filtro por substring do caminho, separado por virgula")
+    parser.add_argument("--comparar", help="JSON de uma execucao anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    diretorio = tempfile.mkdtemp(prefix="bench_rotas_")
+    os.environ.update({
+        "SUPABASE_REST_URL": "http://postgrest.bench/rest/v1",
+        "SUPABASE_KEY": "bench",
+        "SUPABASE_RESPOSTAS_REST_URL": "http://postgrest.bench/rest/v1",
+        "SUPABASE_RESPOSTAS_KEY": "bench",
+        "FILA_JOBS_ARQUIVO": os.path.join(diretorio, "fila.sqlite3"),
+        "FILA_JOBS_TRABALHADORES": "0",
+        "ARTEFATOS_DIRETORIO": os.path.join(diretorio, "artefatos"),
+        "LOG_NIVEL": os.environ.get("LOG_NIVEL", "WARNING")
+    })
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+    import postgrest_falso
+
+    banco = postgrest_falso.PostgrestFalso()
+    postgrest_falso.instalar(banco)
+    import app as app_modulo
+
+    bancada = Bancada(app_modulo, banco, diretorio)
+    filtros = [f for f in args.rotas.split(",") if f]
+    rotas = [(rota, cenarios) for rota, cenarios in ROTAS if not filtros or any(f in rota for f in filtros)]
+
+    resultados = []
+    print(f"{'rota':<46} {'resp':>5} {'cenario':>7} {'mediana (ms)':>13} {'p95 (ms)':>10} {'postgrest':>9}")
+    for tamanho in [int(t) for t in args.tamanhos.split(",") if t]:
+        autoavaliacao, equipe = gerar_equipe(tamanho)
+        popular(banco, autoavaliacao, equipe)
+        # Aquece pool de graficos, indice e conexoes fora da medicao
+        bancada.esfriar()
+        bancada.chamar("/salvar-grafico-waterfall-gaps", autoavaliacao)
+        for rota, cenarios in rotas:
+            for cenario in cenarios:
+                resultado = {"respondentes": tamanho, **bancada.medir(rota, cenario, autoavaliacao, args.repeticoes)}
+                resultados.append(resultado)
+                print(f"{rota:<46} {tamanho:>5} {cenario:>7} {resultado['mediana_ms']:>13.2f}"
+                      f" {resultado['p95_ms']:>10.2f} {resultado['chamadas_postgrest']:>9}")
+
+    saida = {
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "resultados": resultados
+    }
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(saida, arquivo, indent=1, ensure_ascii=False)
+    print(f"Resultados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        regressoes = comparar(anterior, saida, args.tolerancia)
+        for rota, tamanho, cenario, antes, depois, razao in regressoes:
+            print(f"REGRESSAO {rota} {tamanho} {cenario}: {antes:.2f} -> {depois:.2f} ms ({razao:.2f}x)")
+        if regressoes:
+            sys.exit(1)
+        print(f"Sem regressoes acima de {args.tolerancia:.0%} em relacao a {anterior.get('commit')}.")
+
+
+if __name__ == "__main__":
+    main()
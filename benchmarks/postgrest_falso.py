@@ -0,0 +1,248 @@
+"""PostgREST em memoria para benchmarks: um adaptador do requests que responde sem rede.
+
+Entende o subconjunto usado pelo servico: filtros eq/neq/gt/gte/lt/lte/like/ilike/in/is
+(com not.), select de colunas, order, limit/offset, e POST (com upsert por
+on_conflict), PATCH e DELETE. Funcoes em /rpc/ sao emuladas em Python
+(FUNCOES). Qualquer host cai no mesmo banco em memoria.
+"""
+import copy
+import fnmatch
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+PARAMETROS_DE_CONTROLE = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _comparavel(valor, texto):
+    if isinstance(valor, bool):
+        return valor, texto.lower() == "true"
+    if isinstance(valor, (int, float)):
+        try:
+            return valor, type(valor)(texto)
+        except ValueError:
+            return str(valor), texto
+    return ("" if valor is None else str(valor)), texto
+
+
+def _condicao(coluna, expressao):
+    negar = expressao.startswith("not.")
+    if negar:
+        expressao = expressao[4:]
+    operador, _, argumento = expressao.partition(".")
+
+    def testar(linha):
+        valor = linha.get(coluna)
+        if operador == "is":
+            resultado = valor is None if argumento == "null" else valor == (argumento == "true")
+        elif operador == "in":
+            resultado = str(valor) in argumento.strip("()").split(",")
+        elif operador in ("like", "ilike"):
+            padrao = argumento.replace("*", "%").replace("%", "*")
+            alvo = "" if valor is None else str(valor)
+            if operador == "ilike":
+                padrao, alvo = padrao.lower(), alvo.lower()
+            resultado = fnmatch.fnmatchcase(alvo, padrao)
+        elif valor is None:
+            resultado = False
+        else:
+            esquerda, direita = _comparavel(valor, argumento)
+            resultado = {
+                "eq": esquerda == direita,
+                "neq": esquerda != direita,
+                "gt": esquerda > direita,
+                "gte": esquerda >= direita,
+                "lt": esquerda < direita,
+                "lte": esquerda <= direita
+            }[operador]
+        return not resultado if negar else resultado
+    return testar
+
+
+def _somar_listas(atual, nova):
+    return [(a or 0) + (b or 0) for a, b in zip(atual, nova)]
+
+
+def _somar_agregado_microambiente(banco, p_empresa, p_codrodada, p_email_lider, p_email, p_respondentes, p_contagem,
+                                  p_soma_ideal, p_soma_real, p_soma_gap, p_histograma):
+    # Emula sql/agregados_microambiente.sql
+    chave = (p_empresa, p_codrodada, p_email_lider)
+    somadas = banco.tabelas.setdefault("agregados_microambiente_somadas", [])
+    if any((l["empresa"], l["codrodada"], l["emailLider"], l["email"]) == chave + (p_email,) for l in somadas):
+        return False
+    banco._inserir("agregados_microambiente_somadas", {
+        "empresa": p_empresa, "codrodada": p_codrodada, "emailLider": p_email_lider, "email": p_email
+    })
+    linhas = banco.tabelas.setdefault("agregados_microambiente", [])
+    atual = next((l for l in linhas if (l["empresa"], l["codrodada"], l["emailLider"]) == chave), None)
+    if atual is None:
+        atual = banco._inserir("agregados_microambiente", {
+            "empresa": p_empresa, "codrodada": p_codrodada, "emailLider": p_email_lider, "respondentes": 0,
+            "contagem": [0] * len(p_contagem), "soma_ideal": [0.0] * len(p_soma_ideal),
+            "soma_real": [0.0] * len(p_soma_real), "soma_gap": [0.0] * len(p_soma_gap),
+            "histograma": [0] * len(p_histograma)
+        })
+    atual["respondentes"] += p_respondentes
+    for coluna, valores in (("contagem", p_contagem), ("soma_ideal", p_soma_ideal), ("soma_real", p_soma_real),
+                            ("soma_gap", p_soma_gap), ("histograma", p_histograma)):
+        atual[coluna] = _somar_listas(atual[coluna], valores)
+    atual["atualizado_em"] = datetime.now(timezone.utc).isoformat()
+    return True
+
+
+FUNCOES = {
+    "somar_agregado_microambiente": _somar_agregado_microambiente
+}
+
+
+class PostgrestFalso:
+    def __init__(self):
+        self.tabelas = {}
+        self.chamadas = Counter()
+        self._proximo_id = {}
+        self._trava = threading.Lock()
+
+    # --- Dados ---
+
+    def carregar(self, tabela, linhas):
+        with self._trava:
+            self.tabelas[tabela] = []
+            self._proximo_id[tabela] = 1
+            for linha in linhas:
+                self._inserir(tabela, copy.deepcopy(linha))
+
+    def limpar(self, tabela):
+        self.carregar(tabela, [])
+
+    def linhas(self, tabela):
+        with self._trava:
+            return copy.deepcopy(self.tabelas.get(tabela, []))
+
+    def _inserir(self, tabela, linha):
+        if "id" not in linha:
+            linha["id"] = self._proximo_id.get(tabela, 1)
+        self._proximo_id[tabela] = max(self._proximo_id.get(tabela, 1), int(linha["id"]) + 1)
+        self.tabelas.setdefault(tabela, []).append(linha)
+        return linha
+
+    # --- Consultas ---
+
+    def _filtrar(self, linhas, parametros):
+        condicoes = [
+            _condicao(coluna, valor) for coluna, valor in parametros if coluna not in PARAMETROS_DE_CONTROLE
+        ]
+        return [linha for linha in linhas if all(condicao(linha) for condicao in condicoes)]
+
+    def _consultar(self, tabela, parametros):
+        controle = dict(parametros)
+        linhas = self._filtrar(self.tabelas.get(tabela, []), parametros)
+        for parte in reversed([p for p in controle.get("order", "").split(",") if p]):
+            coluna, _, direcao = parte.partition(".")
+            decrescente = direcao.startswith("desc")
+            # Como no Postgres: nulos por ultimo no asc e primeiro no desc
+            linhas.sort(key=lambda linha: (linha.get(coluna) is None, linha.get(coluna)), reverse=decrescente)
+        inicio = int(controle.get("offset", 0))
+        linhas = linhas[inicio:]
+        if "limit" in controle:
+            linhas = linhas[:int(controle["limit"])]
+        select = controle.get("select", "*")
+        if select != "*":
+            colunas = [coluna.strip() for coluna in select.split(",")]
+            linhas = [{coluna: linha.get(coluna) for coluna in colunas} for linha in linhas]
+        return linhas
+
+    def atender(self, metodo, tabela, parametros, corpo, prefer):
+        """Devolve (status, corpo em JSON ou None). Funcoes chegam como tabela "rpc/<nome>"."""
+        representacao = "return=representation" in prefer
+        with self._trava:
+            self.chamadas[(metodo, tabela)] += 1
+            if tabela.startswith("rpc/"):
+                funcao = FUNCOES.get(tabela[4:])
+                if funcao is None:
+                    return 404, {"code": "PGRST202", "message": f"Could not find the function {tabela[4:]}"}
+                resultado = funcao(self, **(corpo or {}))
+                return (200, resultado) if resultado is not None else (204, None)
+
+            if metodo == "GET":
+                return 200, self._consultar(tabela, parametros)
+
+            if metodo == "POST":
+                novas = corpo if isinstance(corpo, list) else [corpo]
+                conflito = [c for c in dict(parametros).get("on_conflict", "id").split(",") if c]
+                mesclar = "resolution=merge-duplicates" in prefer
+                ignorar = "resolution=ignore-duplicates" in prefer
+                existentes = {
+                    tuple(linha.get(c) for c in conflito): linha for linha in self.tabelas.get(tabela, [])
+                }
+                gravadas = []
+                for nova in novas:
+                    nova = copy.deepcopy(nova)
+                    chave = tuple(nova.get(c) for c in conflito)
+                    atual = existentes.get(chave) if all(v is not None for v in chave) else None
+                    if atual is not None:
+                        if ignorar:
+                            continue
+                        if not mesclar:
+                            return 409, {"code": "23505", "message": "duplicate key value violates unique constraint"}
+                        atual.update(nova)
+                        gravadas.append(atual)
+                    else:
+                        gravadas.append(self._inserir(tabela, nova))
+                        existentes[chave] = gravadas[-1]
+                return 201, copy.deepcopy(gravadas) if representacao else None
+
+            alvo = self._filtrar(self.tabelas.get(tabela, []), parametros)
+            if metodo == "PATCH":
+                for linha in alvo:
+                    linha.update(copy.deepcopy(corpo))
+            elif metodo == "DELETE":
+                ids = {id(linha) for linha in alvo}
+                self.tabelas[tabela] = [linha for linha in self.tabelas.get(tabela, []) if id(linha) not in ids]
+            else:
+                return 405, {"message": f"Metodo {metodo} nao suportado"}
+            if representacao:
+                return 200, copy.deepcopy(alvo)
+            return 204, None
+
+
+class AdaptadorPostgrest(BaseAdapter):
+    def __init__(self, banco):
+        super().__init__()
+        self.banco = banco
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        partes = url.path.rstrip("/").split("/")
+        tabela = "/".join(partes[-2:]) if len(partes) > 1 and partes[-2] == "rpc" else partes[-1]
+        corpo = json.loads(request.body) if request.body else None
+        status, dados = self.banco.atender(
+            request.method.upper(), tabela, parse_qsl(url.query, keep_blank_values=True), corpo,
+            request.headers.get("Prefer", "")
+        )
+
+        resposta = requests.Response()
+        resposta.status_code = status
+        resposta.reason = "OK" if status < 400 else "Erro"
+        resposta.url = request.url
+        resposta.request = request
+        resposta.encoding = "utf-8"
+        resposta.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        resposta._content = b"" if dados is None else json.dumps(dados, default=str).encode("utf-8")
+        return resposta
+
+    def close(self):
+        pass
+
+
+def instalar(banco):
+    """Troca o adaptador do supabase_rest (antes da primeira chamada) pelo banco em memoria."""
+    import supabase_rest
+
+    supabase_rest._ADAPTADOR = AdaptadorPostgrest(banco)
+    supabase_rest._local.__dict__.pop("sessao", None)
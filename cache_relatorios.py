@@ -0,0 +1,79 @@
+"""Cache LRU/TTL em memoria do ultimo relatorio gerado por (empresa, codrodada, emaillider, tipo_relatorio)."""
+import threading
+import time
+from collections import OrderedDict
+
+import metricas_prometheus
+
+TAMANHO_PADRAO = 1024
+TTL_PADRAO_SEGUNDOS = 3600
+
+
+class CacheRelatorios:
+    def __init__(self, tamanho_maximo=TAMANHO_PADRAO, ttl_segundos=TTL_PADRAO_SEGUNDOS, nome="relatorios"):
+        self.nome = nome
+        self._metrica_acerto = metricas_prometheus.CACHE_CONSULTAS.labels(nome, "acerto")
+        self._metrica_falha = metricas_prometheus.CACHE_CONSULTAS.labels(nome, "falha")
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.despejos = 0
+
+    @staticmethod
+    def chave(empresa, codrodada, emaillider, tipo_relatorio):
+        return (empresa, codrodada, emaillider, tipo_relatorio)
+
+    def obter(self, chave):
+        agora = time.monotonic()
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                self._metrica_falha.inc()
+                return None
+            expira_em, registro = entrada
+            if expira_em <= agora:
+                del self._entradas[chave]
+                self.expirados += 1
+                self.falhas += 1
+                self._metrica_falha.inc()
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            self._metrica_acerto.inc()
+            return registro
+
+    def guardar(self, chave, registro):
+        expira_em = time.monotonic() + self.ttl_segundos
+        with self._trava:
+            self._entradas[chave] = (expira_em, registro)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+                self.despejos += 1
+
+    def descartar(self, chave):
+        with self._trava:
+            self._entradas.pop(chave, None)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                "entradas": len(self._entradas),
+                "tamanho_maximo": self.tamanho_maximo,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "expirados": self.expirados,
+                "despejos": self.despejos,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0
+            }
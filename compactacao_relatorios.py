@@ -0,0 +1,144 @@
+"""Compactacao de relatorios_gerados: mantem as N versoes mais novas de cada chave e apaga o resto em lotes.
+
+Uso:
+    python compactacao_relatorios.py [--manter 1] [--empresa x] [--codrodada y] [--simular]
+
+Le SUPABASE_REST_URL e SUPABASE_KEY do ambiente, como o servico. A mesma
+funcao roda como job ("compactar_relatorios_gerados") na fila de jobs.
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+TABELA = "relatorios_gerados"
+CHAVE = ("empresa", "codrodada", "emaillider", "tipo_relatorio")
+VERSOES_MANTIDAS = 1
+TAMANHO_PAGINA = 1000
+# Cada linha apagada volta com o dados_json (para medir os bytes); o lote limita essa resposta
+TAMANHO_LOTE = 100
+
+log = logging.getLogger(__name__)
+
+
+def _instante(data_criacao):
+    if not data_criacao:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    try:
+        momento = datetime.fromisoformat(str(data_criacao).replace("Z", "+00:00"))
+    except ValueError:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=timezone.utc)
+    return momento
+
+
+def tamanho_json(valor):
+    """Bytes do valor serializado em JSON compacto (aproxima o que a linha ocupa no banco)."""
+    return len(json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def linhas_excedentes(paginas, manter):
+    """Gera os ids das linhas fora das `manter` versoes mais novas (data_criacao, depois id) de cada chave.
+
+    Guarda so `manter` versoes por chave: a memoria cresce com o numero de
+    chaves, nao com o historico. Um id sai assim que e superado.
+    """
+    mais_novas = {}
+    for pagina in paginas:
+        for linha in pagina:
+            chave = tuple(linha.get(coluna) for coluna in CHAVE)
+            versoes = mais_novas.setdefault(chave, [])
+            versao = (_instante(linha.get("data_criacao")), linha["id"])
+            if len(versoes) < manter:
+                heapq.heappush(versoes, versao)
+            else:
+                _, id_excedente = heapq.heappushpop(versoes, versao)
+                yield id_excedente
+
+
+def _remover_lote(cliente, ids, simular):
+    """Apaga (ou so le, ao simular) as linhas de `ids`; devolve (linhas, bytes do dados_json)."""
+    params = {"id": "in.(" + ",".join(str(i) for i in ids) + ")", "select": "id,dados_json"}
+    if simular:
+        resposta = cliente.get(TABELA, params=params)
+    else:
+        resposta = cliente.delete(TABELA, params=params, headers={"Prefer": "return=representation"})
+    resposta.raise_for_status()
+    linhas = resposta.json()
+    return len(linhas), sum(tamanho_json(linha.get("dados_json")) for linha in linhas)
+
+
+def compactar(cliente, manter=VERSOES_MANTIDAS, empresa=None, codrodada=None, simular=False,
+              tamanho_pagina=TAMANHO_PAGINA, tamanho_lote=TAMANHO_LOTE):
+    """Mantem as `manter` versoes mais novas de cada chave de relatorios_gerados; devolve o resumo."""
+    manter = int(manter)
+    if manter < 1:
+        raise ValueError("manter precisa ser pelo menos 1.")
+    inicio = time.perf_counter()
+    params = {"select": "id,data_criacao," + ",".join(CHAVE)}
+    if empresa:
+        params["empresa"] = f"eq.{empresa}"
+    if codrodada:
+        params["codrodada"] = f"eq.{codrodada}"
+
+    resumo = {"manter": manter, "simular": simular, "linhas_lidas": 0, "linhas_removidas": 0,
+              "bytes_liberados": 0, "lotes": 0}
+
+    def paginas():
+        # A leitura avanca por id e so apaga ids ja lidos, entao as paginas seguintes nao mudam
+        for pagina in cliente.paginar(TABELA, params, tamanho_pagina=tamanho_pagina):
+            resumo["linhas_lidas"] += len(pagina)
+            yield pagina
+
+    def remover(lote):
+        linhas, tamanho = _remover_lote(cliente, lote, simular)
+        resumo["linhas_removidas"] += linhas
+        resumo["bytes_liberados"] += tamanho
+        resumo["lotes"] += 1
+        log.info("Compactacao: lote de %s linha(s), %s bytes", linhas, tamanho,
+                 extra={"campos": {"simular": simular, "lidas": resumo["linhas_lidas"]}})
+
+    lote = []
+    for id_excedente in linhas_excedentes(paginas(), manter):
+        lote.append(id_excedente)
+        if len(lote) >= tamanho_lote:
+            remover(lote)
+            lote = []
+    if lote:
+        remover(lote)
+
+    resumo["duracao_segundos"] = round(time.perf_counter() - inicio, 3)
+    log.info("Compactacao de %s concluida: %s de %s linha(s), %s bytes", TABELA, resumo["linhas_removidas"],
+             resumo["linhas_lidas"], resumo["bytes_liberados"], extra={"campos": resumo})
+    return resumo
+
+
+def main():
+    import log_estruturado
+    from supabase_rest import ClienteSupabase
+
+    log_estruturado.configurar()
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--manter", type=int, default=int(os.environ.get("RELATORIOS_VERSOES_MANTIDAS", VERSOES_MANTIDAS)))
+    parser.add_argument("--empresa")
+    parser.add_argument("--codrodada")
+    parser.add_argument("--simular", action="store_true", help="so conta o que seria apagado")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    cliente = ClienteSupabase(os.environ.get("SUPABASE_REST_URL"), os.environ.get("SUPABASE_KEY"))
+    if not cliente.configurado():
+        sys.exit("Defina SUPABASE_REST_URL e SUPABASE_KEY.")
+    resumo = compactar(cliente, manter=args.manter, empresa=args.empresa, codrodada=args.codrodada,
+                       simular=args.simular, tamanho_lote=args.tamanho_lote)
+    print(json.dumps(resumo, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Comparacao entre os lideres de uma rodada: distribuicao por dimensao e subdimensao e a posicao de cada lider.
+
+Parte dos agregados por lider (agregados_microambiente): as somas por questao
+de todos os lideres viram matrizes (lideres x 48), e cada nivel sai de um
+produto pela matriz 0/1 questao -> grupo (48 x grupos), numa passada so para
+todos os lideres. Os numeros de cada lider sao os mesmos dos relatorios de
+equipe (percentuais_por_dimensao, gaps_por_dimensao...).
+"""
+import numpy as np
+
+from pontuacao import NUMERO_QUESTOES
+
+PERCENTIS = (10, 25, 50, 75, 90)
+METRICAS = ("IDEAL_%", "REAL_%", "GAP")
+
+
+def matriz_grupos(ids, quantidade):
+    """0/1 (48, grupos) a partir de dimensao_id/subdimensao_id; questao sem grupo fica zerada."""
+    grupos = np.zeros((NUMERO_QUESTOES, quantidade))
+    validas = ids >= 0
+    grupos[np.flatnonzero(validas), ids[validas]] = 1.0
+    return grupos
+
+
+def empilhar(registros):
+    """Linhas de agregados_microambiente -> contagem e somas (lideres, 48)."""
+    def coluna(campo, tipo):
+        return np.array([registro[campo] for registro in registros], dtype=tipo).reshape(-1, NUMERO_QUESTOES)
+
+    return (
+        coluna("contagem", np.int64),
+        coluna("soma_ideal", float),
+        coluna("soma_real", float),
+        coluna("soma_gap", float)
+    )
+
+
+def por_grupo(contagem, soma_ideal, soma_real, soma_gap, grupos, pontos_maximos):
+    """IDEAL_%, REAL_% e GAP (lideres, grupos); NaN onde o lider nao respondeu nenhuma questao do grupo."""
+    respondidas = contagem > 0
+    divisor = np.where(respondidas, contagem, 1)
+
+    def medias(somas):
+        return np.where(respondidas, somas / divisor, 0.0)
+
+    questoes = respondidas.astype(float) @ grupos
+    ausentes = questoes == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ideal = np.round(medias(soma_ideal) @ grupos / pontos_maximos * 100, 1)
+        real = np.round(medias(soma_real) @ grupos / pontos_maximos * 100, 1)
+        gap = medias(soma_gap) @ grupos / questoes
+    for valores in (ideal, real, gap):
+        valores[ausentes] = np.nan
+    return {"IDEAL_%": ideal, "REAL_%": real, "GAP": gap}
+
+
+def posicoes(valores):
+    """Posicao de cada lider em cada coluna (1 = maior valor; empates dividem a posicao; 0 = sem valor)."""
+    resultado = np.zeros(valores.shape, dtype=np.int64)
+    for coluna in range(valores.shape[1]):
+        valores_coluna = valores[:, coluna]
+        presentes = ~np.isnan(valores_coluna)
+        ordenados = np.sort(valores_coluna[presentes])
+        # Quantos lideres tem valor estritamente maior, mais um
+        maiores = len(ordenados) - np.searchsorted(ordenados, valores_coluna[presentes], side="right")
+        resultado[presentes, coluna] = maiores + 1
+    return resultado
+
+
+def distribuicao(valores):
+    """Lideres com valor, media e percentis de cada coluna."""
+    presentes = (~np.isnan(valores)).sum(axis=0)
+    resultado = {"lideres": presentes, "media": np.full(valores.shape[1], np.nan)}
+    percentis = np.full((len(PERCENTIS), valores.shape[1]), np.nan)
+    com_valor = presentes > 0
+    if com_valor.any():
+        resultado["media"][com_valor] = np.nanmean(valores[:, com_valor], axis=0)
+        percentis[:, com_valor] = np.nanpercentile(valores[:, com_valor], PERCENTIS, axis=0)
+    for posicao, percentil in enumerate(PERCENTIS):
+        resultado[f"p{percentil}"] = percentis[posicao]
+    return resultado
+
+
+def _numero(valor):
+    return None if np.isnan(valor) else float(valor)
+
+
+def _linhas(valores, ausentes):
+    """Matriz -> lista de listas com None onde `ausentes` (poucas celulas: o resto vai num tolist so)."""
+    linhas = valores.tolist()
+    for i, j in zip(*np.nonzero(ausentes)):
+        linhas[i][j] = None
+    return linhas
+
+
+def comparar(indice, registros, email_lider=None):
+    """Distribuicao por dimensao e subdimensao entre os lideres de `registros` e a posicao de cada um.
+
+    Em "lideres", cada nivel traz listas na mesma ordem de "dimensoes" /
+    "subdimensoes" (null onde o lider nao tem a dimensao). A posicao e pelo
+    REAL_% (1 = maior). Com `email_lider`, so esse lider vem em "lideres"; a
+    distribuicao continua sendo de todos.
+    """
+    registros = [registro for registro in registros if registro.get("respondentes")]
+    contagem, soma_ideal, soma_real, soma_gap = empilhar(registros)
+    niveis = (
+        ("dimensoes", "DIMENSAO", indice.dimensao_id[1:], indice.dimensoes, indice.pontos_maximos_dimensao),
+        ("subdimensoes", "SUBDIMENSAO", indice.subdimensao_id[1:], indice.subdimensoes,
+         indice.pontos_maximos_subdimensao)
+    )
+
+    selecionados = np.arange(len(registros))
+    if email_lider:
+        selecionados = np.array([i for i, registro in enumerate(registros)
+                                 if registro.get("emailLider") == email_lider], dtype=np.intp)
+    lideres = [
+        {
+            "empresa": registros[i].get("empresa"),
+            "emailLider": registros[i].get("emailLider"),
+            "respondentes": int(registros[i]["respondentes"])
+        }
+        for i in selecionados
+    ]
+
+    resultado = {"lideres_comparados": len(registros), "percentis": list(PERCENTIS)}
+    for nivel, coluna, ids, nomes, pontos_maximos in niveis:
+        valores = por_grupo(contagem, soma_ideal, soma_real, soma_gap, matriz_grupos(ids, len(nomes)), pontos_maximos)
+        distribuicoes = {metrica: distribuicao(valores[metrica]) for metrica in METRICAS}
+        resultado[nivel] = [
+            {
+                coluna: nome,
+                "lideres": int(distribuicoes["GAP"]["lideres"][g]),
+                **{
+                    metrica: {campo: _numero(serie[g]) for campo, serie in distribuicoes[metrica].items()
+                              if campo != "lideres"}
+                    for metrica in METRICAS
+                }
+            }
+            for g, nome in enumerate(nomes)
+        ]
+
+        colunas = {
+            metrica: _linhas(valores[metrica][selecionados], np.isnan(valores[metrica][selecionados]))
+            for metrica in METRICAS
+        }
+        posicao = posicoes(valores["REAL_%"])[selecionados]
+        colunas["posicao"] = _linhas(posicao, posicao == 0)
+        for j, lider in enumerate(lideres):
+            lider[nivel] = {campo: linhas[j] for campo, linhas in colunas.items()}
+    resultado["lideres"] = lideres
+    return resultado
@@ -0,0 +1,161 @@
+"""Cliente Google Drive do processo: credenciais reaproveitadas, cache de ids de pasta e downloads em paralelo."""
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import metricas
+import metricas_prometheus
+import tempos_requisicao
+from cache_relatorios import CacheRelatorios
+
+ESCOPOS = ["https://www.googleapis.com/auth/drive"]
+TIMEOUT_SEGUNDOS = 60
+TAMANHO_PAGINA = 1000
+DOWNLOADS_SIMULTANEOS = 8
+TTL_PASTAS_SEGUNDOS = 600
+MIME_PASTA = "application/vnd.google-apps.folder"
+
+
+def _literal(valor):
+    return "'" + str(valor).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+@contextmanager
+def _medir(operacao):
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception as erro:
+        duracao = time.perf_counter() - inicio
+        tempos_requisicao.somar("drive", duracao)
+        metricas.registrar_latencia(f"drive {operacao}", duracao, erro=True)
+        metricas_prometheus.DRIVE_SEGUNDOS.labels(operacao, type(erro).__name__).observe(duracao)
+        raise
+    duracao = time.perf_counter() - inicio
+    tempos_requisicao.somar("drive", duracao)
+    metricas.registrar_latencia(f"drive {operacao}", duracao)
+    metricas_prometheus.DRIVE_SEGUNDOS.labels(operacao, "ok").observe(duracao)
+
+
+class ClienteDrive:
+    def __init__(self, pasta_raiz, variavel_credenciais="GOOGLE_APPLICATION_CREDENTIALS",
+                 downloads_simultaneos=DOWNLOADS_SIMULTANEOS, ttl_pastas=TTL_PASTAS_SEGUNDOS):
+        self.pasta_raiz = pasta_raiz
+        self.variavel_credenciais = variavel_credenciais
+        self.downloads_simultaneos = downloads_simultaneos
+        # caminho (tupla de nomes a partir da raiz) -> id; so ids encontrados entram
+        self.pastas = CacheRelatorios(tamanho_maximo=4096, ttl_segundos=ttl_pastas, nome="drive_pastas")
+        self._credenciais = None
+        self._trava = threading.Lock()
+        self._local = threading.local()
+        self._executor = None
+        self._executor_pid = None
+
+    def _obter_credenciais(self):
+        if self._credenciais is None:
+            with self._trava:
+                if self._credenciais is None:
+                    from google.oauth2 import service_account
+                    self._credenciais = service_account.Credentials.from_service_account_info(
+                        json.loads(os.environ.get(self.variavel_credenciais)),
+                        scopes=ESCOPOS
+                    )
+        return self._credenciais
+
+    def servico(self):
+        """Servico drive v3 da thread atual (httplib2.Http nao e thread-safe; as credenciais sao compartilhadas)."""
+        servico = getattr(self._local, "servico", None)
+        if servico is None:
+            import google_auth_httplib2
+            import httplib2
+            from googleapiclient.discovery import build
+
+            http = google_auth_httplib2.AuthorizedHttp(
+                self._obter_credenciais(), http=httplib2.Http(timeout=TIMEOUT_SEGUNDOS)
+            )
+            # Documento de discovery embutido na biblioteca: sem GET de discovery a cada build
+            servico = build("drive", "v3", http=http, static_discovery=True, cache_discovery=False)
+            self._local.servico = servico
+        return servico
+
+    def _pool(self):
+        with self._trava:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.downloads_simultaneos, thread_name_prefix="drive-download"
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def listar(self, q, campos="id, name"):
+        """Gera os arquivos de `q`, pagina a pagina, pedindo so `campos`."""
+        token = None
+        while True:
+            with _medir("list"):
+                resposta = self.servico().files().list(
+                    q=q,
+                    fields=f"nextPageToken, files({campos})",
+                    pageSize=TAMANHO_PAGINA,
+                    pageToken=token
+                ).execute()
+            yield from resposta.get("files", [])
+            token = resposta.get("nextPageToken")
+            if not token:
+                return
+
+    def id_pasta(self, *caminho):
+        """Id da pasta em raiz/caminho[0]/caminho[1]/..., ou None se algum nivel nao existir."""
+        pai = self.pasta_raiz
+        for nivel in range(1, len(caminho) + 1):
+            chave = tuple(caminho[:nivel])
+            encontrado = self.pastas.obter(chave)
+            if encontrado is None:
+                q = (f"{_literal(pai)} in parents and name={_literal(caminho[nivel - 1])}"
+                     f" and mimeType='{MIME_PASTA}' and trashed=false")
+                encontrado = next((arquivo["id"] for arquivo in self.listar(q, campos="id")), None)
+                if encontrado is None:
+                    return None
+                self.pastas.guardar(chave, encontrado)
+            pai = encontrado
+        return pai
+
+    def baixar(self, arquivo_id):
+        from googleapiclient.http import MediaIoBaseDownload
+
+        buffer = io.BytesIO()
+        with _medir("download"):
+            downloader = MediaIoBaseDownload(buffer, self.servico().files().get_media(fileId=arquivo_id))
+            concluido = False
+            while not concluido:
+                _, concluido = downloader.next_chunk()
+        return buffer.getvalue()
+
+    def baixar_json(self, arquivo_ids):
+        """Baixa e decodifica os arquivos em paralelo (limitado ao pool), na ordem de `arquivo_ids`."""
+        arquivo_ids = list(arquivo_ids)
+        if len(arquivo_ids) <= 1:
+            return [json.loads(self.baixar(arquivo_id)) for arquivo_id in arquivo_ids]
+        return [json.loads(conteudo) for conteudo in self._pool().map(self.baixar, arquivo_ids)]
+
+    def enviar(self, nome, conteudo, mimetype, id_pasta):
+        from googleapiclient.http import MediaIoBaseUpload
+
+        media = MediaIoBaseUpload(io.BytesIO(conteudo), mimetype=mimetype)
+        with _medir("upload"):
+            criado = self.servico().files().create(
+                body={"name": nome, "parents": [id_pasta]}, media_body=media, fields="id"
+            ).execute()
+        return criado
+
+    def diagnostico(self):
+        return {
+            "downloads_simultaneos": self.downloads_simultaneos,
+            "pastas": self.pastas.estatisticas(),
+            "latencias": {
+                nome: valores for nome, valores in metricas.resumo().items() if nome.startswith("drive ")
+            }
+        }
@@ -0,0 +1,210 @@
+"""Gravacao adiada (write-behind) em lotes, com coalescencia por chave, retentativa e esvaziamento na saida."""
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import metricas_prometheus
+
+TAMANHO_LOTE = 50
+# Espera antes de enviar o registro mais antigo: regravacoes da mesma chave nessa janela viram uma so
+INTERVALO_SEGUNDOS = 0.25
+MAXIMO_PENDENTES = 500
+# Com a fila cheia, quem enfileira espera ate isto; depois o registro mais antigo e descartado
+ESPERA_FILA_CHEIA_SEGUNDOS = 2.0
+MAX_TENTATIVAS = 5
+BACKOFF_BASE_SEGUNDOS = 0.5
+BACKOFF_MAXIMO_SEGUNDOS = 30
+PRAZO_ESVAZIAR_SEGUNDOS = 20
+
+log = logging.getLogger(__name__)
+
+
+def _espera(tentativa):
+    base = min(BACKOFF_BASE_SEGUNDOS * (2 ** (tentativa - 1)), BACKOFF_MAXIMO_SEGUNDOS)
+    return base / 2 + random.uniform(0, base / 2)
+
+
+class FilaGravacoes:
+    """`gravar_lote(registros)` grava uma lista de registros de uma vez e levanta excecao se falhar.
+
+    Cada registro tem uma chave; enquanto ele espera na fila, um registro
+    novo com a mesma chave toma o lugar do antigo (o mais novo vence) e so um
+    chega ao banco. Memoria limitada a `maximo_pendentes` registros.
+    `ao_descartar(chave, registro)`, se informado, e chamado para cada
+    registro que a fila desiste de gravar.
+    """
+
+    def __init__(self, gravar_lote, nome="gravacoes", tamanho_lote=TAMANHO_LOTE, intervalo_segundos=INTERVALO_SEGUNDOS,
+                 maximo_pendentes=MAXIMO_PENDENTES, max_tentativas=MAX_TENTATIVAS, ao_descartar=None):
+        self.gravar_lote = gravar_lote
+        self.ao_descartar = ao_descartar
+        self.nome = nome
+        self.tamanho_lote = max(int(tamanho_lote), 1)
+        self.intervalo_segundos = intervalo_segundos
+        self.maximo_pendentes = max(int(maximo_pendentes), 1)
+        self.max_tentativas = max_tentativas
+        # chave -> (registro, tentativas, instante em que entrou na fila)
+        self._pendentes = OrderedDict()
+        self._em_voo = 0
+        self._condicao = threading.Condition()
+        self._contadores = Counter()
+        self._pid = None
+        self._thread = None
+        self._encerrando = False
+        self._metrica_pendentes = metricas_prometheus.GRAVACOES_PENDENTES.labels(nome)
+
+    # --- API ---
+
+    def enfileirar(self, chave, registro):
+        self.iniciar()
+        with self._condicao:
+            if not self._encerrando:
+                self._guardar(chave, registro)
+                return
+        # Depois de esvaziar (worker saindo) nao ha thread de envio: grava na hora
+        self._enviar([(chave, (registro, self.max_tentativas - 1, time.monotonic()))])
+
+    def pendentes(self):
+        """Registros na fila ou em envio (0 = tudo confirmado pelo banco)."""
+        with self._condicao:
+            return len(self._pendentes) + self._em_voo
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                "pendentes": len(self._pendentes),
+                "em_envio": self._em_voo,
+                "maximo_pendentes": self.maximo_pendentes,
+                "tamanho_lote": self.tamanho_lote,
+                **{nome: self._contadores[nome] for nome in
+                   ("enfileiradas", "coalescidas", "gravadas", "lotes", "retentativas", "descartadas")}
+            }
+
+    def iniciar(self):
+        """Sobe a thread de envio deste processo (uma vez por pid; seguro depois do fork do gunicorn)."""
+        if self._pid == os.getpid():
+            return
+        with self._condicao:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._encerrando = False
+            self._thread = threading.Thread(target=self._laco, name=f"fila-{self.nome}", daemon=True)
+            self._thread.start()
+            atexit.register(self.esvaziar)
+
+    def esvaziar(self, prazo_segundos=PRAZO_ESVAZIAR_SEGUNDOS):
+        """Envia o que resta e para a thread; devolve quantos registros ficaram sem gravar."""
+        with self._condicao:
+            if self._pid != os.getpid() or self._encerrando:
+                return len(self._pendentes) + self._em_voo
+            self._encerrando = True
+            self._condicao.notify_all()
+        self._thread.join(prazo_segundos)
+        restantes = self.pendentes()
+        if restantes:
+            log.error("Fila %s: %s registro(s) sem gravar ao encerrar", self.nome, restantes)
+        else:
+            log.info("Fila %s esvaziada", self.nome)
+        return restantes
+
+    # --- Fila ---
+
+    def _guardar(self, chave, registro):
+        # Chamado com a trava
+        if chave in self._pendentes:
+            # Mantem a posicao (e o instante de entrada) do registro substituido
+            _, _, desde = self._pendentes[chave]
+            self._pendentes[chave] = (registro, 0, desde)
+            self._contar("coalescidas")
+            return
+        limite = time.monotonic() + ESPERA_FILA_CHEIA_SEGUNDOS
+        while len(self._pendentes) >= self.maximo_pendentes:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                descartada, (registro_descartado, _, _) = self._pendentes.popitem(last=False)
+                self._descartar(descartada, registro_descartado)
+                log.warning("Fila %s cheia: registro %s descartado", self.nome, descartada)
+                break
+            self._condicao.wait(restante)
+            if chave in self._pendentes:
+                return self._guardar(chave, registro)
+        self._pendentes[chave] = (registro, 0, time.monotonic())
+        self._contar("enfileiradas")
+        self._atualizar_metrica()
+        self._condicao.notify_all()
+
+    def _contar(self, nome, quantidade=1):
+        self._contadores[nome] += quantidade
+        metricas_prometheus.GRAVACOES_ADIADAS.labels(self.nome, nome).inc(quantidade)
+
+    def _descartar(self, chave, registro):
+        self._contar("descartadas")
+        if self.ao_descartar is not None:
+            self.ao_descartar(chave, registro)
+
+    def _atualizar_metrica(self):
+        self._metrica_pendentes.set(len(self._pendentes) + self._em_voo)
+
+    def _proximo_lote(self):
+        """Espera o registro mais antigo completar a janela; devolve o lote, ou None ao encerrar sem pendencias."""
+        with self._condicao:
+            while True:
+                if not self._pendentes:
+                    if self._encerrando:
+                        return None
+                    self._condicao.wait()
+                    continue
+                _, _, desde = next(iter(self._pendentes.values()))
+                espera = desde + self.intervalo_segundos - time.monotonic()
+                if espera > 0 and not self._encerrando and len(self._pendentes) < self.tamanho_lote:
+                    self._condicao.wait(espera)
+                    continue
+                lote = [self._pendentes.popitem(last=False)
+                        for _ in range(min(self.tamanho_lote, len(self._pendentes)))]
+                self._em_voo = len(lote)
+                # Libera quem esperava espaco na fila
+                self._condicao.notify_all()
+                return lote
+
+    def _laco(self):
+        while True:
+            lote = self._proximo_lote()
+            if lote is None:
+                return
+            falhou = self._enviar(lote)
+            with self._condicao:
+                self._em_voo = 0
+                self._atualizar_metrica()
+                self._condicao.notify_all()
+                if falhou and not self._encerrando:
+                    tentativa = max(tentativas for _, (_, tentativas, _) in lote) + 1
+                    self._condicao.wait_for(lambda: self._encerrando, _espera(tentativa))
+
+    def _enviar(self, lote):
+        """Grava o lote; numa falha, devolve os registros a fila (se nao houver versao mais nova). True se falhou."""
+        try:
+            self.gravar_lote([registro for _, (registro, _, _) in lote])
+        except Exception as e:
+            with self._condicao:
+                for chave, (registro, tentativas, desde) in lote:
+                    if chave in self._pendentes:
+                        # Ja chegou uma versao mais nova desta chave; a antiga nao precisa ir
+                        continue
+                    if tentativas + 1 >= self.max_tentativas:
+                        self._descartar(chave, registro)
+                        log.error("Fila %s: registro %s descartado apos %s tentativas: %s",
+                                  self.nome, chave, tentativas + 1, e)
+                        continue
+                    self._pendentes[chave] = (registro, tentativas + 1, desde)
+                    self._contar("retentativas")
+            log.warning("Fila %s: falha ao gravar lote de %s: %s", self.nome, len(lote), e, exc_info=True)
+            return True
+        with self._condicao:
+            self._contar("gravadas", len(lote))
+            self._contar("lotes")
+        return False
@@ -0,0 +1,308 @@
+"""Fila de jobs persistida em SQLite, com workers em threads, retentativa e deduplicacao."""
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+MAX_TENTATIVAS = 3
+BACKOFF_BASE_SEGUNDOS = 5
+BACKOFF_MAXIMO_SEGUNDOS = 120
+# Job em execucao cujo worker morreu volta para a fila quando o lease vence
+DURACAO_LEASE_SEGUNDOS = 15 * 60
+INTERVALO_OCIOSO_SEGUNDOS = 1.0
+RETENCAO_FINALIZADOS_SEGUNDOS = 7 * 24 * 3600
+INTERVALO_LIMPEZA_SEGUNDOS = 3600
+# De quanto em quanto tempo os workers conferem se algum job agendado venceu
+INTERVALO_AGENDA_SEGUNDOS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL,
+    resultado TEXT,
+    erro TEXT,
+    disponivel_em REAL NOT NULL,
+    lease_ate REAL,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_chave_ativa ON jobs (chave) WHERE status IN ('pendente', 'executando');
+CREATE INDEX IF NOT EXISTS jobs_status_disponivel ON jobs (status, disponivel_em);
+"""
+
+log = logging.getLogger(__name__)
+
+
+class ErroDefinitivo(Exception):
+    """Falha que nao adianta repetir (dados ausentes, parametros invalidos)."""
+
+
+def chave_job(tipo, parametros):
+    bruto = json.dumps({"tipo": tipo, "parametros": parametros}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def _iso(instante):
+    if instante is None:
+        return None
+    return datetime.fromtimestamp(instante, tz=timezone.utc).isoformat()
+
+
+def _espera(tentativa):
+    base = min(BACKOFF_BASE_SEGUNDOS * (2 ** (tentativa - 1)), BACKOFF_MAXIMO_SEGUNDOS)
+    return base / 2 + random.uniform(0, base / 2)
+
+
+class FilaJobs:
+    def __init__(self, caminho, trabalhadores=2, max_tentativas=MAX_TENTATIVAS):
+        self.caminho = caminho
+        self.trabalhadores = max(int(trabalhadores), 0)
+        self.max_tentativas = max_tentativas
+        self._tipos = {}
+        self._agenda = []
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._acordar = threading.Event()
+        self._pid = None
+        self._ultima_limpeza = 0.0
+        self._ultima_agenda = 0.0
+        self._schema_criado = False
+
+    # --- Conexao (uma por thread) ---
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None or getattr(self._local, "pid", None) != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA busy_timeout=30000")
+            if not self._schema_criado:
+                conexao.executescript(_SCHEMA)
+                self._schema_criado = True
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+    # --- API ---
+
+    def registrar(self, tipo, funcao):
+        """`funcao(**parametros)` devolve um dict serializavel em JSON (o resultado do job)."""
+        self._tipos[tipo] = funcao
+
+    def tipos(self):
+        return sorted(self._tipos)
+
+    def agendar(self, tipo, parametros, intervalo_segundos):
+        """Enfileira `tipo` com `parametros` sempre que o ultimo job igual tiver sido criado ha mais de `intervalo_segundos`."""
+        if tipo not in self._tipos:
+            raise KeyError(tipo)
+        self._agenda.append((tipo, parametros, intervalo_segundos))
+
+    def _inserir(self, conexao, tipo, chave, parametros):
+        agora = time.time()
+        job_id = uuid.uuid4().hex
+        conexao.execute(
+            "INSERT INTO jobs (id, tipo, chave, parametros, status, max_tentativas, disponivel_em, criado_em, atualizado_em)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, tipo, chave, json.dumps(parametros, ensure_ascii=False), PENDENTE,
+             self.max_tentativas, agora, agora, agora)
+        )
+        return job_id
+
+    def enfileirar(self, tipo, parametros):
+        """Devolve (job, novo). Um job identico ainda pendente ou em execucao e reaproveitado."""
+        if tipo not in self._tipos:
+            raise KeyError(tipo)
+        chave = chave_job(tipo, parametros)
+        conexao = self._conexao()
+
+        for _ in range(3):
+            try:
+                job_id = self._inserir(conexao, tipo, chave, parametros)
+            except sqlite3.IntegrityError:
+                existente = conexao.execute(
+                    "SELECT id FROM jobs WHERE chave = ? AND status IN (?, ?)", (chave, PENDENTE, EXECUTANDO)
+                ).fetchone()
+                if existente is None:
+                    # O job identico terminou entre o INSERT e o SELECT; tenta de novo
+                    continue
+                return self.obter(existente["id"]), False
+            self._acordar.set()
+            return self.obter(job_id), True
+        raise RuntimeError("Nao foi possivel enfileirar o job.")
+
+    def obter(self, job_id):
+        linha = self._conexao().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if linha is None:
+            return None
+        return {
+            "id": linha["id"],
+            "tipo": linha["tipo"],
+            "status": linha["status"],
+            "parametros": json.loads(linha["parametros"]),
+            "tentativas": linha["tentativas"],
+            "max_tentativas": linha["max_tentativas"],
+            "resultado": json.loads(linha["resultado"]) if linha["resultado"] else None,
+            "erro": linha["erro"],
+            "criado_em": _iso(linha["criado_em"]),
+            "atualizado_em": _iso(linha["atualizado_em"]),
+            "proxima_tentativa_em": _iso(linha["disponivel_em"]) if linha["status"] == PENDENTE else None
+        }
+
+    def estatisticas(self):
+        contagens = dict(self._conexao().execute("SELECT status, count(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "trabalhadores_por_processo": self.trabalhadores,
+            "tipos": self.tipos(),
+            "agenda": [{"tipo": tipo, "parametros": parametros, "intervalo_segundos": intervalo}
+                       for tipo, parametros, intervalo in self._agenda],
+            **{status: contagens.get(status, 0) for status in (PENDENTE, EXECUTANDO, CONCLUIDO, FALHOU)}
+        }
+
+    def enfileirar_agendados(self):
+        """Enfileira os jobs da agenda que venceram; devolve quantos entraram na fila."""
+        conexao = self._conexao()
+        enfileirados = 0
+        for tipo, parametros, intervalo in self._agenda:
+            chave = chave_job(tipo, parametros)
+            # Consulta e insercao na mesma transacao: so um worker enfileira cada vencimento
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                ultimo = conexao.execute("SELECT max(criado_em) FROM jobs WHERE chave = ?", (chave,)).fetchone()[0]
+                if ultimo is None or time.time() - ultimo >= intervalo:
+                    self._inserir(conexao, tipo, chave, parametros)
+                    enfileirados += 1
+                conexao.execute("COMMIT")
+            except sqlite3.IntegrityError:
+                # Ainda ha um job igual pendente ou em execucao
+                conexao.execute("ROLLBACK")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+        if enfileirados:
+            self._acordar.set()
+        return enfileirados
+
+    def limpar_finalizados(self, retencao_segundos=RETENCAO_FINALIZADOS_SEGUNDOS):
+        cursor = self._conexao().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND atualizado_em < ?",
+            (CONCLUIDO, FALHOU, time.time() - retencao_segundos)
+        )
+        return cursor.rowcount
+
+    # --- Workers ---
+
+    def iniciar(self):
+        """Sobe os workers deste processo (uma vez por pid; seguro depois do fork do gunicorn)."""
+        if self._pid == os.getpid():
+            return
+        with self._trava:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._conexao()
+            for indice in range(self.trabalhadores):
+                threading.Thread(target=self._laco, name=f"fila-jobs-{indice}", daemon=True).start()
+
+    def _laco(self):
+        while True:
+            try:
+                if time.time() - self._ultima_limpeza > INTERVALO_LIMPEZA_SEGUNDOS:
+                    self._ultima_limpeza = time.time()
+                    self.limpar_finalizados()
+                if self._agenda and time.time() - self._ultima_agenda > INTERVALO_AGENDA_SEGUNDOS:
+                    self._ultima_agenda = time.time()
+                    self.enfileirar_agendados()
+                linha = self._reservar()
+            except Exception:
+                log.exception("Fila de jobs: erro ao reservar o proximo job")
+                time.sleep(INTERVALO_OCIOSO_SEGUNDOS)
+                continue
+            if linha is None:
+                self._acordar.wait(INTERVALO_OCIOSO_SEGUNDOS)
+                self._acordar.clear()
+                continue
+            self._executar(linha)
+
+    def _reservar(self):
+        conexao = self._conexao()
+        tipos = list(self._tipos)
+        if not tipos:
+            return None
+        marcadores = ",".join("?" for _ in tipos)
+        while True:
+            agora = time.time()
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                linha = conexao.execute(
+                    f"SELECT * FROM jobs WHERE tipo IN ({marcadores}) AND ("
+                    "(status = ? AND disponivel_em <= ?) OR (status = ? AND lease_ate < ?)"
+                    ") ORDER BY disponivel_em LIMIT 1",
+                    (*tipos, PENDENTE, agora, EXECUTANDO, agora)
+                ).fetchone()
+                if linha is None:
+                    conexao.execute("COMMIT")
+                    return None
+                if linha["status"] == EXECUTANDO and linha["tentativas"] >= linha["max_tentativas"]:
+                    conexao.execute(
+                        "UPDATE jobs SET status = ?, erro = ?, lease_ate = NULL, atualizado_em = ? WHERE id = ?",
+                        (FALHOU, "Execucao interrompida (lease expirado) sem tentativas restantes.", agora, linha["id"])
+                    )
+                    conexao.execute("COMMIT")
+                    continue
+                conexao.execute(
+                    "UPDATE jobs SET status = ?, tentativas = tentativas + 1, lease_ate = ?, atualizado_em = ? WHERE id = ?",
+                    (EXECUTANDO, agora + DURACAO_LEASE_SEGUNDOS, agora, linha["id"])
+                )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+            return conexao.execute("SELECT * FROM jobs WHERE id = ?", (linha["id"],)).fetchone()
+
+    def _finalizar(self, job_id, status, resultado=None, erro=None, disponivel_em=None):
+        agora = time.time()
+        self._conexao().execute(
+            "UPDATE jobs SET status = ?, resultado = ?, erro = ?, lease_ate = NULL, atualizado_em = ?,"
+            " disponivel_em = COALESCE(?, disponivel_em) WHERE id = ? AND status = ?",
+            (status, resultado, erro, agora, disponivel_em, job_id, EXECUTANDO)
+        )
+
+    def _executar(self, linha):
+        job_id, tipo, tentativa = linha["id"], linha["tipo"], linha["tentativas"]
+        inicio = time.perf_counter()
+        try:
+            resultado = self._tipos[tipo](**json.loads(linha["parametros"]))
+        except ErroDefinitivo as e:
+            log.warning("Job %s %s: falhou sem retentativa: %s", tipo, job_id, e)
+            self._finalizar(job_id, FALHOU, erro=str(e))
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            if tentativa < linha["max_tentativas"]:
+                espera = _espera(tentativa)
+                log.warning("Job %s %s: %s, tentativa %s/%s, nova em %.0fs", tipo, job_id, erro,
+                            tentativa, linha["max_tentativas"], espera, exc_info=True)
+                self._finalizar(job_id, PENDENTE, erro=erro, disponivel_em=time.time() + espera)
+            else:
+                log.error("Job %s %s: %s, tentativas esgotadas", tipo, job_id, erro, exc_info=True)
+                self._finalizar(job_id, FALHOU, erro=erro)
+        else:
+            log.info("Job %s %s: concluido em %.1fs", tipo, job_id, time.perf_counter() - inicio)
+            self._finalizar(job_id, CONCLUIDO, resultado=json.dumps(resultado, ensure_ascii=False, default=str))
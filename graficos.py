@@ -0,0 +1,259 @@
+"""Renderizacao de graficos com Figure/Agg (sem pyplot) num pool de processos limitado."""
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import matplotlib.ticker as mticker
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import metricas
+import metricas_prometheus
+import tempos_requisicao
+
+
+def _inteiro_env(nome, padrao):
+    try:
+        return int(os.environ.get(nome, padrao))
+    except ValueError:
+        return padrao
+
+
+# 0 desliga o pool e renderiza na propria thread (ainda sem pyplot)
+PROCESSOS = max(_inteiro_env("GRAFICOS_PROCESSOS", 2), 0)
+FILA_MAXIMA = max(_inteiro_env("GRAFICOS_FILA_MAXIMA", max(PROCESSOS, 1) * 4), 1)
+ESPERA_FILA_SEGUNDOS = 10
+TIMEOUT_RENDERIZACAO = _inteiro_env("GRAFICOS_TIMEOUT", 60)
+# Entra na receita dos artefatos: mudar o desenho de um grafico exige incrementar
+VERSAO_RENDERIZACAO = 1
+
+
+class FilaGraficosCheia(Exception):
+    pass
+
+
+# --- Renderizadores: funcoes de modulo (picklaveis) que recebem dados simples e devolvem bytes ---
+
+@contextmanager
+def _figura(figsize):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    try:
+        yield fig
+    finally:
+        fig.clear()
+
+
+def _exportar(fig, formato, **opcoes):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=formato, **opcoes)
+    return buf.getvalue()
+
+
+def _cores_gap(gaps):
+    return ['#FFA07A' if abs(g) > 20 else '#ADD8E6' for g in gaps]
+
+
+def _barras_gap(ax, registros, coluna, titulo, rotacao, fonte_rotulo):
+    nomes = [r[coluna] for r in registros]
+    gaps = [r["GAP"] for r in registros]
+    barras = ax.bar(range(len(nomes)), gaps, color=_cores_gap(gaps), width=0.8)
+    ax.set_xticks(range(len(nomes)))
+    ax.set_xticklabels(nomes, rotation=rotacao)
+    ax.set_xlabel(coluna)
+    ax.set_title(titulo, fontsize=13)
+    ax.set_ylabel("GAP (%)")
+    ax.set_ylim(-100, 0)
+    ax.yaxis.set_major_locator(mticker.MultipleLocator(10))
+    for barra in barras:
+        h = barra.get_height()
+        ax.annotate(f'{h:.1f}%', (barra.get_x() + barra.get_width() / 2, h - 3), ha='center', fontsize=fonte_rotulo)
+
+
+def renderizar_waterfall_gaps(gaps_dimensao, gaps_subdimensao):
+    with _figura((14, 7)) as fig:
+        ax1, ax2 = fig.subplots(nrows=2)
+        _barras_gap(ax1, gaps_dimensao, "DIMENSAO", "GAP por DimensÃ£o", 45, 8)
+        _barras_gap(ax2, gaps_subdimensao, "SUBDIMENSAO", "GAP por SubdimensÃ£o", 90, 7)
+        fig.legend(["GAP > 20% = Laranja claro", "GAP â‰¤ 20% = Azul claro"],
+                   loc='upper center', ncol=2, fontsize=9, bbox_to_anchor=(0.5, 1.02))
+        fig.tight_layout(rect=[0, 0, 1, 0.95])
+        return _exportar(fig, "png", dpi=300, bbox_inches='tight')
+
+
+def renderizar_termometro_gaps(gap_count, classificacao_texto, empresa, codrodada, email_lider):
+    with _figura((6, 6)) as fig:
+        ax = fig.subplots()
+        ax.set_xlim(0, 10)
+        ax.set_ylim(0, 10)
+        ax.text(5, 5, f"GAPs: {gap_count}\nClassificaÃ§Ã£o: {classificacao_texto}",
+                ha='center', va='center', fontsize=16, color='black')
+        ax.axis('off')
+        ax.set_title(f"TERMÃ”METRO DE GAPS\n{empresa} - {codrodada} - {email_lider}", fontsize=14)
+        fig.tight_layout()
+        return _exportar(fig, "png", dpi=150, bbox_inches='tight')
+
+
+def renderizar_autoavaliacao_dimensoes(labels, valores_ideal, valores_real):
+    with _figura((12, 6)) as fig:
+        ax = fig.subplots()
+        ax.plot(labels, valores_real, marker="o", label="Como Ã©", color="navy")
+        ax.plot(labels, valores_ideal, marker="o", label="Como deveria ser", color="darkorange")
+        ax.axhline(60, color="gray", linestyle="--", linewidth=1)
+        ax.set_ylim(0, 100)
+        ax.set_yticks(range(0, 101, 10))
+        ax.set_ylabel("% de Engajamento")
+        ax.set_title("MICROAMBIENTE DE EQUIPES â€“ DIMENSÃ•ES", fontsize=16, weight="bold")
+        ax.set_facecolor("#f2f2f2")
+        ax.legend()
+        fig.tight_layout()
+        return _exportar(fig, "png")
+
+
+def renderizar_gaps_por_questao(afirmacoes, gaps, rodape):
+    with _figura((16, 10)) as fig:
+        ax = fig.subplots()
+        ax.set_facecolor("#eaeaf2")
+        ax.grid(True, color="white", linewidth=1)
+        ax.set_axisbelow(True)
+        for lado in ax.spines.values():
+            lado.set_visible(False)
+
+        cores = ["red" if g < -20 else ("orange" if g < -10 else "blue") for g in gaps]
+        barras = ax.barh(afirmacoes, gaps, color=cores)
+        for barra, gap in zip(barras, gaps):
+            ax.text(barra.get_width() - 3, barra.get_y() + barra.get_height() / 2, f'{gap:.1f}%',
+                    va='center', ha='right', fontsize=7, color="white")
+
+        ax.set_title("ANÃLISE DE MICROAMBIENTE - OPORTUNIDADES DE DESENVOLVIMENTO", fontsize=14, weight="bold")
+        ax.set_xlabel("GAP (%)")
+        ax.set_xlim(-100, 0)
+        ax.xaxis.set_major_locator(mticker.MultipleLocator(10))
+        fig.tight_layout()
+        fig.text(0.01, 0.01, rodape, fontsize=8, color="gray")
+        return _exportar(fig, "pdf")
+
+
+# --- Pool de processos ---
+
+_trava = threading.Lock()
+_executor = None
+_executor_pid = None
+_vagas = threading.BoundedSemaphore(FILA_MAXIMA)
+_contadores = {
+    "enviados": 0,
+    "concluidos": 0,
+    "falhas": 0,
+    "rejeitados": 0,
+    "pendentes": 0,
+    "pico_pendentes": 0
+}
+
+
+def _pool():
+    global _executor, _executor_pid
+    with _trava:
+        # spawn: o filho nao herda threads, travas nem o estado do matplotlib do worker web
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=PROCESSOS, mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _descartar_pool(executor):
+    global _executor
+    with _trava:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _concluido(futuro):
+    with _trava:
+        _contadores["pendentes"] -= 1
+        if futuro.cancelled() or futuro.exception() is not None:
+            _contadores["falhas"] += 1
+        else:
+            _contadores["concluidos"] += 1
+    _vagas.release()
+
+
+def _registrar(funcao, inicio, erro=None):
+    duracao = time.perf_counter() - inicio
+    tempos_requisicao.somar("grafico", duracao)
+    metricas.registrar_latencia(f"grafico {funcao.__name__}", duracao, erro=erro is not None)
+    status = "ok" if erro is None else type(erro).__name__
+    metricas_prometheus.GRAFICOS_SEGUNDOS.labels(funcao.__name__, status).observe(duracao)
+
+
+def renderizar(funcao, *args):
+    """Executa `funcao(*args)` no pool e devolve os bytes gerados.
+
+    A fila (pendentes + em execucao) e limitada a FILA_MAXIMA; quem nao
+    consegue vaga em ESPERA_FILA_SEGUNDOS recebe FilaGraficosCheia.
+    """
+    inicio = time.perf_counter()
+
+    if PROCESSOS == 0:
+        try:
+            resultado = funcao(*args)
+        except Exception as erro:
+            _registrar(funcao, inicio, erro)
+            raise
+        _registrar(funcao, inicio)
+        return resultado
+
+    if not _vagas.acquire(timeout=ESPERA_FILA_SEGUNDOS):
+        with _trava:
+            _contadores["rejeitados"] += 1
+        metricas_prometheus.GRAFICOS_REJEITADOS.inc()
+        raise FilaGraficosCheia(f"Fila de graficos cheia ({FILA_MAXIMA} pendentes).")
+
+    executor = _pool()
+    try:
+        futuro = executor.submit(funcao, *args)
+    except (BrokenProcessPool, RuntimeError):
+        _vagas.release()
+        _descartar_pool(executor)
+        raise
+    with _trava:
+        _contadores["enviados"] += 1
+        _contadores["pendentes"] += 1
+        _contadores["pico_pendentes"] = max(_contadores["pico_pendentes"], _contadores["pendentes"])
+    futuro.add_done_callback(_concluido)
+
+    try:
+        resultado = futuro.result(timeout=TIMEOUT_RENDERIZACAO)
+    except BrokenProcessPool as erro:
+        # Um filho morreu (OOM, sinal): o proximo pedido sobe um pool novo
+        _descartar_pool(executor)
+        _registrar(funcao, inicio, erro)
+        raise
+    except Exception as erro:
+        _registrar(funcao, inicio, erro)
+        raise
+    _registrar(funcao, inicio)
+    return resultado
+
+
+def estatisticas():
+    with _trava:
+        contadores = dict(_contadores)
+    pendentes = contadores["pendentes"]
+    return {
+        "processos": PROCESSOS,
+        "fila_maxima": FILA_MAXIMA,
+        "em_execucao": min(pendentes, PROCESSOS),
+        "na_fila": max(pendentes - PROCESSOS, 0),
+        **contadores,
+        "latencias": {
+            nome: valores for nome, valores in metricas.resumo().items() if nome.startswith("grafico ")
+        }
+    }
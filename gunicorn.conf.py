@@ -0,0 +1,35 @@
+"""Configuracao do gunicorn: threads por worker, diretorio multiprocesso das metricas Prometheus e esvaziamento das filas de gravacao."""
+import glob
+import os
+
+# Precisa estar no ambiente antes de qualquer import de prometheus_client (master e workers)
+DIRETORIO_METRICAS = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_microambiente")
+
+# O mesmo GUNICORN_THREADS dimensiona a pool HTTP do supabase_rest (workers importam o app com este ambiente)
+threads = max(int(os.environ.get("GUNICORN_THREADS", "1")), 1)
+if threads > 1:
+    worker_class = "gthread"
+
+
+def on_starting(server):
+    # Arquivos de uma execucao anterior somariam contadores de processos que ja nao existem
+    os.makedirs(DIRETORIO_METRICAS, exist_ok=True)
+    for arquivo in glob.glob(os.path.join(DIRETORIO_METRICAS, "*.db")):
+        os.remove(arquivo)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Tira o worker morto dos gauges "live*" (requisicoes em andamento)
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    import sys
+
+    # Envia os relatorios e as somas de agregados ainda nas filas antes de o worker sair
+    app = sys.modules.get("app")
+    if app is not None:
+        app.FILA_GRAVACOES.esvaziar()
+        app.FILA_AGREGADOS.esvaziar()
@@ -0,0 +1,114 @@
+"""Log estruturado em JSON (uma linha por evento) com nivel, id da requisicao e campos truncados.
+
+Os modulos usam `logging.getLogger(__name__)` e passam dados em
+`extra={"campos": {...}}`. A gravacao no stdout roda numa thread propria
+(QueueHandler/QueueListener): a thread da requisicao so enfileira o registro.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+NIVEL = os.environ.get("LOG_NIVEL", "INFO").upper()
+try:
+    TAMANHO_MAXIMO_CAMPO = int(os.environ.get("LOG_TAMANHO_CAMPO", "500"))
+except ValueError:
+    TAMANHO_MAXIMO_CAMPO = 500
+TAMANHO_MAXIMO_MENSAGEM = 2000
+TAMANHO_MAXIMO_TRACEBACK = 8000
+# Acima disto a fila descarta eventos em vez de segurar a requisicao
+TAMANHO_FILA = 10000
+
+_id_requisicao = contextvars.ContextVar("id_requisicao", default=None)
+_trava = threading.Lock()
+_pid = None
+_ouvinte = None
+
+
+def truncar(valor, limite=TAMANHO_MAXIMO_CAMPO):
+    if not isinstance(valor, (str, int, float, bool, type(None))):
+        valor = json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, str) and len(valor) > limite:
+        return f"{valor[:limite]}...(+{len(valor) - limite})"
+    return valor
+
+
+def definir_id_requisicao(id_requisicao):
+    return _id_requisicao.set(id_requisicao)
+
+
+def limpar_id_requisicao(token):
+    _id_requisicao.reset(token)
+
+
+class FormatoJson(logging.Formatter):
+    def format(self, record):
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": truncar(record.getMessage(), TAMANHO_MAXIMO_MENSAGEM)
+        }
+        id_requisicao = getattr(record, "id_requisicao", None)
+        if id_requisicao:
+            evento["id_requisicao"] = id_requisicao
+        for nome, valor in (getattr(record, "campos", None) or {}).items():
+            evento[nome] = truncar(valor)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            evento["traceback"] = truncar(record.exc_text, TAMANHO_MAXIMO_TRACEBACK)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class _FilaSemBloqueio(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Roda na thread que logou: fixa a mensagem e o id da requisicao antes de cruzar a fila
+        record.id_requisicao = _id_requisicao.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configurar():
+    """Instala o handler em fila no logger raiz (uma vez por pid; seguro depois do fork do gunicorn)."""
+    global _pid, _ouvinte
+    if _pid == os.getpid():
+        return
+    with _trava:
+        if _pid == os.getpid():
+            return
+        fila = queue.Queue(TAMANHO_FILA)
+        saida = logging.StreamHandler(sys.stdout)
+        saida.setFormatter(FormatoJson())
+        _ouvinte = logging.handlers.QueueListener(fila, saida, respect_handler_level=True)
+        _ouvinte.start()
+
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            if isinstance(handler, _FilaSemBloqueio):
+                raiz.removeHandler(handler)
+        raiz.addHandler(_FilaSemBloqueio(fila))
+        raiz.setLevel(NIVEL)
+        _pid = os.getpid()
+
+
+@atexit.register
+def _esvaziar():
+    if _ouvinte is not None and _pid == os.getpid():
+        _ouvinte.stop()
@@ -0,0 +1,62 @@
+"""Metricas de latencia em memoria do processo (chamadas externas por serie)."""
+import threading
+from collections import deque
+
+AMOSTRAS_POR_SERIE = 512
+
+_trava = threading.Lock()
+_series = {}
+
+
+class _Serie:
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.total_segundos = 0.0
+        self.maximo_segundos = 0.0
+        self.amostras = deque(maxlen=AMOSTRAS_POR_SERIE)
+
+
+def registrar_latencia(nome, segundos, erro=False):
+    with _trava:
+        serie = _series.get(nome)
+        if serie is None:
+            serie = _series[nome] = _Serie()
+        serie.chamadas += 1
+        if erro:
+            serie.erros += 1
+        serie.total_segundos += segundos
+        serie.maximo_segundos = max(serie.maximo_segundos, segundos)
+        serie.amostras.append(segundos)
+
+
+def _percentil(ordenadas, fracao):
+    if not ordenadas:
+        return 0.0
+    posicao = min(len(ordenadas) - 1, int(round(fracao * (len(ordenadas) - 1))))
+    return ordenadas[posicao]
+
+
+def resumo():
+    with _trava:
+        copia = {
+            nome: (s.chamadas, s.erros, s.total_segundos, s.maximo_segundos, sorted(s.amostras))
+            for nome, s in _series.items()
+        }
+
+    saida = {}
+    for nome, (chamadas, erros, total, maximo, ordenadas) in sorted(copia.items()):
+        saida[nome] = {
+            "chamadas": chamadas,
+            "erros": erros,
+            "media_ms": round(total / chamadas * 1000, 2) if chamadas else 0.0,
+            "p50_ms": round(_percentil(ordenadas, 0.50) * 1000, 2),
+            "p95_ms": round(_percentil(ordenadas, 0.95) * 1000, 2),
+            "max_ms": round(maximo * 1000, 2)
+        }
+    return saida
+
+
+def limpar():
+    with _trava:
+        _series.clear()
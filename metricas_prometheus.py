@@ -0,0 +1,74 @@
+"""Metricas Prometheus do servico (GET /metrics), somadas entre os workers do gunicorn.
+
+Com PROMETHEUS_MULTIPROC_DIR definido antes da importacao (gunicorn.conf.py faz
+isso), cada processo grava os valores em arquivos mmap nesse diretorio e
+/metrics agrega todos; sem ele, vale o registro em memoria do proprio processo.
+"""
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Requisicoes e chamadas externas: de 5 ms a 30 s
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Pontuacao de uma equipe: poucos ms
+BUCKETS_PONTUACAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Graficos: de 50 ms ao timeout do pool
+BUCKETS_GRAFICOS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUISICOES = Counter(
+    "microambiente_requisicoes_total", "Requisicoes HTTP atendidas.", ["rota", "metodo", "status"]
+)
+REQUISICOES_SEGUNDOS = Histogram(
+    "microambiente_requisicao_segundos", "Duracao das requisicoes HTTP por rota.", ["rota", "metodo"],
+    buckets=BUCKETS_LATENCIA
+)
+REQUISICOES_EM_ANDAMENTO = Gauge(
+    "microambiente_requisicoes_em_andamento", "Requisicoes HTTP em andamento.", multiprocess_mode="livesum"
+)
+SUPABASE_SEGUNDOS = Histogram(
+    "microambiente_supabase_segundos", "Duracao de cada tentativa de chamada ao Supabase.",
+    ["tabela", "metodo", "status"], buckets=BUCKETS_LATENCIA
+)
+DRIVE_SEGUNDOS = Histogram(
+    "microambiente_drive_segundos", "Duracao das chamadas ao Google Drive.", ["operacao", "status"],
+    buckets=BUCKETS_LATENCIA
+)
+PONTUACAO_SEGUNDOS = Histogram(
+    "microambiente_pontuacao_segundos", "Duracao da pontuacao de uma equipe.", buckets=BUCKETS_PONTUACAO
+)
+GRAFICOS_SEGUNDOS = Histogram(
+    "microambiente_grafico_segundos", "Duracao da renderizacao de graficos (espera no pool incluida).",
+    ["renderizador", "status"], buckets=BUCKETS_GRAFICOS
+)
+GRAFICOS_REJEITADOS = Counter(
+    "microambiente_graficos_rejeitados_total", "Graficos recusados com a fila de renderizacao cheia."
+)
+CACHE_CONSULTAS = Counter(
+    "microambiente_cache_consultas_total", "Consultas aos caches em memoria e em disco.", ["cache", "resultado"]
+)
+GRAVACOES_ADIADAS = Counter(
+    "microambiente_gravacoes_adiadas_total", "Registros da fila de gravacao por desfecho.", ["fila", "resultado"]
+)
+AGREGADOS_SOMAS = Counter(
+    "microambiente_agregados_somas_total", "Respostas de equipe somadas ao agregado do lider, por desfecho.",
+    ["resultado"]
+)
+GRAVACOES_PENDENTES = Gauge(
+    "microambiente_gravacoes_pendentes", "Registros na fila de gravacao ainda nao confirmados pelo banco.", ["fila"],
+    multiprocess_mode="livesum"
+)
+
+
+def multiprocesso():
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def exportar():
+    """Devolve (corpo, content-type) no formato texto do Prometheus."""
+    if multiprocesso():
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
@@ -0,0 +1,114 @@
+"""Planilhas de referencia do microambiente compiladas num artefato pickle com checksum das xlsx."""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+ARTEFATO_PADRAO = os.path.join(DIRETORIO, "planilhas_referencia.pkl")
+VERSAO_ARTEFATO = 1
+
+log = logging.getLogger(__name__)
+
+# nome -> (arquivo xlsx, argumentos extras de read_excel)
+PLANILHAS = {
+    "dimensao": ("pontos_maximos_dimensao.xlsx", {}),
+    "subdimensao": ("pontos_maximos_subdimensao.xlsx", {}),
+    "matriz": (
+        "TABELA_GERAL_MICROAMBIENTE_COM_CHAVE.xlsx",
+        {"dtype": {"PONTUACAO_IDEAL": float, "PONTUACAO_REAL": float}}
+    )
+}
+
+
+def checksum_arquivo(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 16), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def ler_xlsx(nome, diretorio=DIRETORIO):
+    arquivo, opcoes = PLANILHAS[nome]
+    return pd.read_excel(os.path.join(diretorio, arquivo), **opcoes)
+
+
+def compilar(destino=ARTEFATO_PADRAO, diretorio=DIRETORIO):
+    artefato = {"versao": VERSAO_ARTEFATO, "checksums": {}, "tabelas": {}}
+    for nome, (arquivo, _) in PLANILHAS.items():
+        artefato["checksums"][nome] = checksum_arquivo(os.path.join(diretorio, arquivo))
+        artefato["tabelas"][nome] = ler_xlsx(nome, diretorio)
+
+    # Grava ao lado e renomeia: um worker subindo no meio do build nunca le pickle pela metade
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as saida:
+        pickle.dump(artefato, saida, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, destino)
+    return artefato
+
+
+def _ler_artefato(caminho):
+    try:
+        with open(caminho, "rb") as entrada:
+            artefato = pickle.load(entrada)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("Artefato '%s' ilegivel (%s: %s); usando as xlsx.", caminho, type(e).__name__, e)
+        return None
+    if not isinstance(artefato, dict) or artefato.get("versao") != VERSAO_ARTEFATO:
+        log.warning("Artefato '%s' de versao diferente; usando as xlsx.", caminho)
+        return None
+    return artefato
+
+
+def carregar(caminho_artefato=None, diretorio=DIRETORIO):
+    """Devolve {nome: DataFrame} das tres planilhas.
+
+    Cada tabela vem do artefato quando o checksum gravado bate com a xlsx em
+    disco (ou a xlsx nao existe); senao e lida da xlsx. Uma planilha que nao
+    puder ser lida vira DataFrame vazio, como antes.
+    """
+    caminho_artefato = caminho_artefato or os.environ.get("PLANILHAS_REFERENCIA_ARTEFATO", ARTEFATO_PADRAO)
+    artefato = _ler_artefato(caminho_artefato) or {"checksums": {}, "tabelas": {}}
+
+    tabelas = {}
+    for nome, (arquivo, _) in PLANILHAS.items():
+        caminho = os.path.join(diretorio, arquivo)
+        compilada = artefato["tabelas"].get(nome)
+        try:
+            checksum = checksum_arquivo(caminho)
+        except FileNotFoundError:
+            checksum = None
+
+        if compilada is not None and checksum in (None, artefato["checksums"].get(nome)):
+            tabelas[nome] = compilada
+            log.debug("%s carregada do artefato compilado.", arquivo)
+            continue
+        if compilada is not None:
+            log.warning("%s mudou desde a compilacao do artefato; lendo a xlsx.", arquivo)
+
+        try:
+            tabelas[nome] = ler_xlsx(nome, diretorio)
+            log.debug("%s carregada com sucesso.", arquivo)
+        except FileNotFoundError:
+            log.critical("Arquivo '%s' nao encontrado.", arquivo)
+            tabelas[nome] = pd.DataFrame()
+        except Exception as e:
+            log.critical("Ao carregar '%s': %s.", arquivo, e)
+            tabelas[nome] = pd.DataFrame()
+    return tabelas
+
+
+if __name__ == "__main__":
+    destino = sys.argv[1] if len(sys.argv) > 1 else ARTEFATO_PADRAO
+    inicio = time.perf_counter()
+    artefato = compilar(destino)
+    print(f"Artefato gravado em {destino} ({os.path.getsize(destino)} bytes, {time.perf_counter() - inicio:.2f}s)")
+    for nome, checksum in artefato["checksums"].items():
+        print(f"  {PLANILHAS[nome][0]}: {artefato['tabelas'][nome].shape} sha256={checksum[:12]}")
@@ -0,0 +1,414 @@
+"""Pontuacao do microambiente: indice da matriz de referencia e motor vetorizado de equipes."""
+import hashlib
+import json
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+import metricas_prometheus
+import tempos_requisicao
+
+NUMERO_QUESTOES = 48
+NOTA_MAXIMA = 6
+
+_PADRAO_CHAVE = r"^Q(\d+)_I(\d+)_R(\d+)$"
+_PADRAO_QUESTAO = re.compile(r"^Q(\d+)$")
+
+# Questao da matriz -> campo do formulario (QxxC = real, Qxxk = ideal)
+MAPEAMENTO_QUESTOES = {
+    'Q01': 'Q01', 'Q02': 'Q10', 'Q03': 'Q11', 'Q04': 'Q12', 'Q05': 'Q13',
+    'Q06': 'Q14', 'Q07': 'Q15', 'Q08': 'Q16', 'Q09': 'Q17', 'Q10': 'Q18',
+    'Q11': 'Q19', 'Q12': 'Q02', 'Q13': 'Q20', 'Q14': 'Q21', 'Q15': 'Q22',
+    'Q16': 'Q23', 'Q17': 'Q24', 'Q18': 'Q25', 'Q19': 'Q26', 'Q20': 'Q27',
+    'Q21': 'Q28', 'Q22': 'Q29', 'Q23': 'Q03', 'Q24': 'Q30', 'Q25': 'Q31',
+    'Q26': 'Q32', 'Q27': 'Q33', 'Q28': 'Q34', 'Q29': 'Q35', 'Q30': 'Q36',
+    'Q31': 'Q37', 'Q32': 'Q38', 'Q33': 'Q39', 'Q34': 'Q04', 'Q35': 'Q40',
+    'Q36': 'Q41', 'Q37': 'Q42', 'Q38': 'Q43', 'Q39': 'Q44', 'Q40': 'Q45',
+    'Q41': 'Q46', 'Q42': 'Q47', 'Q43': 'Q48', 'Q44': 'Q05', 'Q45': 'Q06',
+    'Q46': 'Q07', 'Q47': 'Q08', 'Q48': 'Q09'
+}
+
+QUESTOES = [f"Q{i:02d}" for i in range(1, NUMERO_QUESTOES + 1)]
+
+_NOTAS_TEXTO = {str(nota): nota for nota in range(1, NOTA_MAXIMA + 1)}
+
+# Chave, dentro do dados_json de cada resposta, do vetor gravado por /enviar-avaliacao
+CAMPO_VETOR = "pontuacao"
+
+
+def numero_questao(questao):
+    encontrado = _PADRAO_QUESTAO.match(str(questao))
+    if not encontrado:
+        return 0
+    numero = int(encontrado.group(1))
+    return numero if 1 <= numero <= NUMERO_QUESTOES else 0
+
+
+class IndicePontuacao:
+    # Tabela densa (questao, ideal, real) -> pontuacoes, montada uma unica vez.
+    # Posicoes invalidas (nota 0 ou chave ausente na matriz) ficam com NaN.
+
+    def __init__(self, matriz, tabela_dimensao, tabela_subdimensao):
+        forma = (NUMERO_QUESTOES + 1, NOTA_MAXIMA + 1, NOTA_MAXIMA + 1)
+        self.pontuacao_ideal = np.full(forma, np.nan)
+        self.pontuacao_real = np.full(forma, np.nan)
+        self.gap = np.full(forma, np.nan)
+        self.dimensao_id = np.full(NUMERO_QUESTOES + 1, -1, dtype=np.int16)
+        self.subdimensao_id = np.full(NUMERO_QUESTOES + 1, -1, dtype=np.int16)
+        self.afirmacoes = [None] * (NUMERO_QUESTOES + 1)
+        self.dimensoes = []
+        self.subdimensoes = []
+
+        colunas = {"CHAVE", "COD", "DIMENSAO", "SUBDIMENSAO", "PONTUACAO_IDEAL", "PONTUACAO_REAL", "GAP"}
+        if not matriz.empty and colunas.issubset(matriz.columns):
+            self._carregar_matriz(matriz)
+
+        self.pontos_maximos_dimensao = self._pontos_maximos(
+            tabela_dimensao, "DIMENSAO", "PONTOS_MAXIMOS_DIMENSAO", self.dimensoes
+        )
+        self.pontos_maximos_subdimensao = self._pontos_maximos(
+            tabela_subdimensao, "SUBDIMENSAO", "PONTOS_MAXIMOS_SUBDIMENSAO", self.subdimensoes
+        )
+        self.versao = self._assinatura()
+
+    def _carregar_matriz(self, matriz):
+        matriz = matriz.drop_duplicates(subset="CHAVE", keep="first")
+        partes = matriz["CHAVE"].astype(str).str.extract(_PADRAO_CHAVE)
+        validas = partes.notna().all(axis=1)
+        matriz = matriz[validas]
+        partes = partes[validas].astype(int)
+
+        q = partes[0].to_numpy()
+        ideal = partes[1].to_numpy()
+        real = partes[2].to_numpy()
+        dentro = (
+            (q >= 1) & (q <= NUMERO_QUESTOES)
+            & (ideal >= 1) & (ideal <= NOTA_MAXIMA)
+            & (real >= 1) & (real <= NOTA_MAXIMA)
+        )
+        matriz = matriz[dentro]
+        q, ideal, real = q[dentro], ideal[dentro], real[dentro]
+
+        self.pontuacao_ideal[q, ideal, real] = pd.to_numeric(matriz["PONTUACAO_IDEAL"], errors="coerce").to_numpy(dtype=float)
+        self.pontuacao_real[q, ideal, real] = pd.to_numeric(matriz["PONTUACAO_REAL"], errors="coerce").to_numpy(dtype=float)
+        self.gap[q, ideal, real] = pd.to_numeric(matriz["GAP"], errors="coerce").to_numpy(dtype=float)
+
+        self.dimensoes = sorted(matriz["DIMENSAO"].dropna().unique().tolist())
+        self.subdimensoes = sorted(matriz["SUBDIMENSAO"].dropna().unique().tolist())
+        posicao_dimensao = {nome: i for i, nome in enumerate(self.dimensoes)}
+        posicao_subdimensao = {nome: i for i, nome in enumerate(self.subdimensoes)}
+
+        primeiras = matriz.drop_duplicates(subset="COD", keep="first")
+        for _, linha in primeiras.iterrows():
+            numero = numero_questao(linha["COD"])
+            if not numero:
+                continue
+            self.dimensao_id[numero] = posicao_dimensao.get(linha["DIMENSAO"], -1)
+            self.subdimensao_id[numero] = posicao_subdimensao.get(linha["SUBDIMENSAO"], -1)
+            self.afirmacoes[numero] = linha.get("AFIRMACAO")
+
+    def _assinatura(self):
+        # Identifica a matriz nos vetores gravados: com outra matriz, o vetor deixa de valer
+        sha = hashlib.sha256()
+        for tabela in (self.pontuacao_ideal, self.pontuacao_real, self.gap, self.dimensao_id):
+            sha.update(tabela.tobytes())
+        sha.update(json.dumps(self.dimensoes, ensure_ascii=False).encode("utf-8"))
+        return sha.hexdigest()[:16]
+
+    @staticmethod
+    def _pontos_maximos(tabela, coluna_nome, coluna_pontos, nomes):
+        pontos = np.full(len(nomes), np.nan)
+        if tabela.empty or coluna_nome not in tabela.columns or coluna_pontos not in tabela.columns:
+            return pontos
+        valores = pd.to_numeric(tabela[coluna_pontos], errors="coerce").fillna(0)
+        por_nome = dict(zip(tabela[coluna_nome], valores))
+        for i, nome in enumerate(nomes):
+            if nome in por_nome:
+                pontos[i] = float(por_nome[nome])
+        return pontos
+
+    def buscar(self, questao, ideal, real):
+        numero = numero_questao(questao)
+        if not numero or not (1 <= ideal <= NOTA_MAXIMA) or not (1 <= real <= NOTA_MAXIMA):
+            return None
+        pontuacao_ideal = self.pontuacao_ideal[numero, ideal, real]
+        if np.isnan(pontuacao_ideal):
+            return None
+        return (
+            float(pontuacao_ideal),
+            float(self.pontuacao_real[numero, ideal, real]),
+            float(self.gap[numero, ideal, real])
+        )
+
+    def dimensao(self, questao):
+        posicao = self.dimensao_id[numero_questao(questao)]
+        return self.dimensoes[posicao] if posicao >= 0 else None
+
+    def subdimensao(self, questao):
+        posicao = self.subdimensao_id[numero_questao(questao)]
+        return self.subdimensoes[posicao] if posicao >= 0 else None
+
+    def afirmacao(self, questao):
+        return self.afirmacoes[numero_questao(questao)]
+
+
+def converter_nota(valor):
+    # Mesmo criterio das rotas: texto com digitos entre 1 e 6; o resto vale 0 (invalido)
+    if valor is None or isinstance(valor, bool):
+        return 0
+    if isinstance(valor, int):
+        return valor if 1 <= valor <= NOTA_MAXIMA else 0
+    texto = str(valor).strip()
+    if not texto.isdigit():
+        return 0
+    nota = int(texto)
+    return nota if 1 <= nota <= NOTA_MAXIMA else 0
+
+
+def _notas_respondente(obter, campos):
+    # Caminho rapido para "1".."6"; o resto passa pela conversao completa
+    try:
+        return [_NOTAS_TEXTO.get(obter(campo)) or converter_nota(obter(campo)) for campo in campos]
+    except TypeError:
+        return [converter_nota(obter(campo)) for campo in campos]
+
+
+def matriz_respostas(avaliacoes, mapeamento=MAPEAMENTO_QUESTOES):
+    # avaliacoesEquipe -> dois arrays int8 (respondentes, 48): ideal (Qxxk) e real (QxxC)
+    campos = [mapeamento[q] if mapeamento else q for q in QUESTOES]
+    campos_ideal = [f"{campo}k" for campo in campos]
+    campos_real = [f"{campo}C" for campo in campos]
+
+    ideal = []
+    real = []
+    for av in avaliacoes:
+        obter = av.get
+        ideal.extend(_notas_respondente(obter, campos_ideal))
+        real.extend(_notas_respondente(obter, campos_real))
+
+    forma = (len(avaliacoes), NUMERO_QUESTOES)
+    return (
+        np.array(ideal, dtype=np.int8).reshape(forma),
+        np.array(real, dtype=np.int8).reshape(forma)
+    )
+
+
+def vetor_pontuado(pontuacao):
+    """Vetor compacto de uma resposta ja pontuada (PontuacaoEquipe de um respondente).
+
+    "ideal", "real" e "gap": as 48 triplas em tres listas (null se a questao
+    nao vale), "dimensoes": totais por dimensao e "matriz": a versao do indice.
+    """
+    def lista(somas):
+        return [float(valor) if contagem else None for contagem, valor in zip(pontuacao.contagem, somas)]
+
+    return {
+        "matriz": pontuacao.indice.versao,
+        "ideal": lista(pontuacao.soma_ideal),
+        "real": lista(pontuacao.soma_real),
+        "gap": lista(pontuacao.soma_gap),
+        "dimensoes": pontuacao.somas_por_dimensao()
+    }
+
+
+def vetor_valido(indice, avaliacao):
+    """O vetor gravado na resposta, se foi calculado com esta matriz; senao None."""
+    vetor = avaliacao.get(CAMPO_VETOR) if isinstance(avaliacao, dict) else None
+    if not isinstance(vetor, dict) or vetor.get("matriz") != indice.versao:
+        return None
+    if any(len(vetor.get(campo) or ()) != NUMERO_QUESTOES for campo in ("ideal", "real", "gap")):
+        return None
+    return vetor
+
+
+def pontuar_vetores(indice, vetores):
+    """Mesmo resultado de pontuar_respostas a partir dos vetores gravados, sem ler notas nem a matriz."""
+    def somar(campo):
+        # Listas planas de floats: null vira NaN na conversao
+        valores = np.array([vetor[campo] for vetor in vetores], dtype=float)
+        return np.where(validas, valores, 0.0).sum(axis=0)
+
+    ideal = np.array([vetor["ideal"] for vetor in vetores], dtype=float)
+    validas = ~np.isnan(ideal)
+    return PontuacaoEquipe(
+        indice,
+        contagem=validas.sum(axis=0),
+        soma_ideal=np.where(validas, ideal, 0.0).sum(axis=0),
+        soma_real=somar("real"),
+        soma_gap=somar("gap"),
+        respondentes=len(vetores)
+    )
+
+
+def pontuar_equipe(indice, avaliacoes, mapeamento=MAPEAMENTO_QUESTOES):
+    inicio = time.perf_counter()
+    # Respostas com vetor da matriz atual nao sao relidas; as demais (antigas ou de
+    # outra matriz) passam pelas notas. Os vetores so existem no MAPEAMENTO_QUESTOES.
+    vetores, brutas = [], avaliacoes
+    if mapeamento is MAPEAMENTO_QUESTOES:
+        brutas = []
+        for avaliacao in avaliacoes:
+            vetor = vetor_valido(indice, avaliacao)
+            if vetor is None:
+                brutas.append(avaliacao)
+            else:
+                vetores.append(vetor)
+    if vetores and not brutas:
+        pontuacao = pontuar_vetores(indice, vetores)
+    else:
+        ideal, real = matriz_respostas(brutas, mapeamento)
+        pontuacao = pontuar_respostas(indice, ideal, real)
+        if vetores:
+            pontuacao = pontuacao.somar(pontuar_vetores(indice, vetores))
+    duracao = time.perf_counter() - inicio
+    metricas_prometheus.PONTUACAO_SEGUNDOS.observe(duracao)
+    tempos_requisicao.somar("pontuacao", duracao)
+    return pontuacao
+
+
+def pontuar_respostas(indice, ideal, real):
+    # Indice plano de (questao, ideal, real) na tabela densa
+    lado = NOTA_MAXIMA + 1
+    posicoes = (np.arange(1, NUMERO_QUESTOES + 1) * lado * lado) + ideal.astype(np.intp) * lado + real
+    validas = (ideal > 0) & (real > 0) & ~np.isnan(indice.pontuacao_ideal.ravel()[posicoes])
+    posicoes = np.where(validas, posicoes, 0)
+
+    def somar(tabela):
+        valores = tabela.ravel()[posicoes]
+        return np.where(validas, valores, 0.0).sum(axis=0)
+
+    return PontuacaoEquipe(
+        indice,
+        contagem=validas.sum(axis=0),
+        soma_ideal=somar(indice.pontuacao_ideal),
+        soma_real=somar(indice.pontuacao_real),
+        soma_gap=somar(indice.gap),
+        respondentes=ideal.shape[0]
+    )
+
+
+def histograma_respostas(ideal, real):
+    """Contagem de respostas validas por (questao, ideal, real): array int64 (48, 6, 6), nota 1 na posicao 0."""
+    validas = (ideal > 0) & (real > 0)
+    questoes = np.broadcast_to(np.arange(NUMERO_QUESTOES), ideal.shape)[validas]
+    posicoes = (questoes * NOTA_MAXIMA + ideal[validas] - 1) * NOTA_MAXIMA + real[validas] - 1
+    contagens = np.bincount(posicoes.astype(np.intp), minlength=NUMERO_QUESTOES * NOTA_MAXIMA * NOTA_MAXIMA)
+    return contagens.reshape(NUMERO_QUESTOES, NOTA_MAXIMA, NOTA_MAXIMA)
+
+
+def pontuar_histograma(indice, histograma, respondentes):
+    # Mesmo resultado de pontuar_respostas a partir das contagens: custo fixo, qualquer que seja a equipe
+    histograma = np.asarray(histograma, dtype=np.int64).reshape(NUMERO_QUESTOES, NOTA_MAXIMA, NOTA_MAXIMA)
+    validas = ~np.isnan(indice.pontuacao_ideal[1:, 1:, 1:])
+    contagens = np.where(validas, histograma, 0)
+
+    def somar(tabela):
+        return (contagens * np.nan_to_num(tabela[1:, 1:, 1:])).sum(axis=(1, 2))
+
+    return PontuacaoEquipe(
+        indice,
+        contagem=contagens.sum(axis=(1, 2)),
+        soma_ideal=somar(indice.pontuacao_ideal),
+        soma_real=somar(indice.pontuacao_real),
+        soma_gap=somar(indice.gap),
+        respondentes=respondentes
+    )
+
+
+class PontuacaoEquipe:
+    # Somas e contagens por questao (posicao 0 = Q01); os relatorios saem das medias
+
+    def __init__(self, indice, contagem, soma_ideal, soma_real, soma_gap, respondentes):
+        self.indice = indice
+        self.contagem = np.asarray(contagem, dtype=np.int64)
+        self.soma_ideal = np.asarray(soma_ideal, dtype=float)
+        self.soma_real = np.asarray(soma_real, dtype=float)
+        self.soma_gap = np.asarray(soma_gap, dtype=float)
+        self.respondentes = int(respondentes)
+
+        self.respondidas = self.contagem > 0
+        divisor = np.where(self.respondidas, self.contagem, 1)
+        self.media_ideal = np.where(self.respondidas, self.soma_ideal / divisor, np.nan)
+        self.media_real = np.where(self.respondidas, self.soma_real / divisor, np.nan)
+        self.media_gap = np.where(self.respondidas, self.soma_gap / divisor, np.nan)
+
+    def somar(self, outra):
+        """Pontuacao das duas equipes juntas."""
+        return PontuacaoEquipe(
+            self.indice,
+            contagem=self.contagem + outra.contagem,
+            soma_ideal=self.soma_ideal + outra.soma_ideal,
+            soma_real=self.soma_real + outra.soma_real,
+            soma_gap=self.soma_gap + outra.soma_gap,
+            respondentes=self.respondentes + outra.respondentes
+        )
+
+    def _agrupar(self, ids, nomes, valores, media=False):
+        validas = self.respondidas & (ids >= 0)
+        presentes = np.bincount(ids[validas], minlength=len(nomes))
+        totais = [np.bincount(ids[validas], weights=v[validas], minlength=len(nomes)) for v in valores]
+        if media:
+            totais = [t / np.where(presentes > 0, presentes, 1) for t in totais]
+        return presentes > 0, totais
+
+    def somas_por_dimensao(self):
+        ids = self.indice.dimensao_id[1:]
+        presentes, (ideal, real) = self._agrupar(ids, self.indice.dimensoes, [self.media_ideal, self.media_real])
+        return {
+            nome: {"ideal": float(ideal[i]), "real": float(real[i])}
+            for i, nome in enumerate(self.indice.dimensoes) if presentes[i]
+        }
+
+    def _percentuais(self, ids, nomes, pontos_maximos, coluna):
+        presentes, (ideal, real) = self._agrupar(ids, nomes, [self.media_ideal, self.media_real])
+        registros = []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ideal_pct = np.round(ideal / pontos_maximos * 100, 1)
+            real_pct = np.round(real / pontos_maximos * 100, 1)
+        for i, nome in enumerate(nomes):
+            if presentes[i] and not np.isnan(pontos_maximos[i]):
+                registros.append({coluna: nome, "IDEAL_%": float(ideal_pct[i]), "REAL_%": float(real_pct[i])})
+        return registros
+
+    def percentuais_por_dimensao(self):
+        return self._percentuais(
+            self.indice.dimensao_id[1:], self.indice.dimensoes, self.indice.pontos_maximos_dimensao, "DIMENSAO"
+        )
+
+    def percentuais_por_subdimensao(self):
+        return self._percentuais(
+            self.indice.subdimensao_id[1:], self.indice.subdimensoes, self.indice.pontos_maximos_subdimensao, "SUBDIMENSAO"
+        )
+
+    def _gaps_medios(self, ids, nomes, coluna):
+        presentes, (gaps,) = self._agrupar(ids, nomes, [self.media_gap], media=True)
+        ordem = np.argsort(gaps, kind="stable")
+        return [{coluna: nomes[i], "GAP": float(gaps[i])} for i in ordem if presentes[i]]
+
+    def gaps_por_dimensao(self):
+        return self._gaps_medios(self.indice.dimensao_id[1:], self.indice.dimensoes, "DIMENSAO")
+
+    def gaps_por_subdimensao(self):
+        return self._gaps_medios(self.indice.subdimensao_id[1:], self.indice.subdimensoes, "SUBDIMENSAO")
+
+    def quantidade_gaps_acima(self, limite=20):
+        return int(np.sum(self.respondidas & (np.abs(np.nan_to_num(self.media_gap)) > limite)))
+
+    def registros_por_questao(self):
+        registros = []
+        for posicao, q in enumerate(QUESTOES):
+            afirmacao = self.indice.afirmacoes[posicao + 1]
+            if not self.respondidas[posicao] or not afirmacao:
+                continue
+            registros.append({
+                "QUESTAO": q,
+                "AFIRMACAO": afirmacao,
+                "DIMENSAO": self.indice.dimensao(q),
+                "SUBDIMENSAO": self.indice.subdimensao(q),
+                "PONTUACAO_IDEAL": float(self.media_ideal[posicao]),
+                "PONTUACAO_REAL": float(self.media_real[posicao]),
+                "GAP": float(self.media_gap[posicao])
+            })
+        return registros
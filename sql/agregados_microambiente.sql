@@ -0,0 +1,96 @@
+-- Agregado corrente da equipe de cada lider (agregados_microambiente.py).
+--
+-- Uma linha por (empresa, codrodada, "emailLider") com, por questao (posicao 1 =
+-- Q01 da matriz), a contagem de respostas validas e as somas de
+-- PONTUACAO_IDEAL, PONTUACAO_REAL e GAP, e o histograma das notas em 48x6x6
+-- posicoes (questao, ideal, real; nota 1 primeiro). Cada resposta nova de
+-- equipe aceita por /enviar-avaliacao entra numa fila do servico, que chama
+-- somar_agregado_microambiente com retentativa; o ON CONFLICT trava a linha do
+-- lider, entao envios simultaneos nao perdem contagem. A funcao anota cada
+-- resposta somada em agregados_microambiente_somadas, na mesma transacao: uma
+-- retentativa de uma soma que ja entrou devolve false e nao soma de novo.
+-- Enquanto este arquivo nao for aplicado, o PostgREST responde PGRST202 e o
+-- envio segue sem agregar.
+--
+-- Instalacao no Supabase (SQL editor), no projeto das respostas:
+--   1. execute este arquivo (pode ser repetido);
+--   2. recarregue o schema do PostgREST: notify pgrst, 'reload schema';
+--   3. preencha as rodadas em andamento: python agregados_microambiente.py --codrodada <rodada>
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS agregados_microambiente (
+    empresa text NOT NULL,
+    codrodada text NOT NULL,
+    "emailLider" text NOT NULL,
+    respondentes integer NOT NULL DEFAULT 0,
+    contagem integer[] NOT NULL,
+    soma_ideal double precision[] NOT NULL,
+    soma_real double precision[] NOT NULL,
+    soma_gap double precision[] NOT NULL,
+    histograma integer[] NOT NULL,
+    atualizado_em timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (empresa, codrodada, "emailLider")
+);
+
+-- Respostas ja somadas (uma por respondente e lider; reconstruir anota as que somou)
+CREATE TABLE IF NOT EXISTS agregados_microambiente_somadas (
+    empresa text NOT NULL,
+    codrodada text NOT NULL,
+    "emailLider" text NOT NULL,
+    email text NOT NULL,
+    somada_em timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (empresa, codrodada, "emailLider", email)
+);
+
+-- Soma posicao a posicao (os dois vetores tem o mesmo tamanho)
+CREATE OR REPLACE FUNCTION somar_vetores(a anyarray, b anyarray) RETURNS anyarray
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT array_agg(coalesce(x, 0) + coalesce(y, 0) ORDER BY i)
+    FROM unnest(a, b) WITH ORDINALITY AS t(x, y, i)
+$$;
+
+-- Versao anterior, sem p_email (nao dava para repetir a chamada com seguranca)
+DROP FUNCTION IF EXISTS somar_agregado_microambiente(
+    text, text, text, integer, integer[], double precision[], double precision[], double precision[], integer[]
+);
+
+CREATE OR REPLACE FUNCTION somar_agregado_microambiente(
+    p_empresa text,
+    p_codrodada text,
+    p_email_lider text,
+    p_email text,
+    p_respondentes integer,
+    p_contagem integer[],
+    p_soma_ideal double precision[],
+    p_soma_real double precision[],
+    p_soma_gap double precision[],
+    p_histograma integer[]
+) RETURNS boolean
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO agregados_microambiente_somadas (empresa, codrodada, "emailLider", email)
+    VALUES (p_empresa, p_codrodada, p_email_lider, p_email)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    INSERT INTO agregados_microambiente AS a
+        (empresa, codrodada, "emailLider", respondentes, contagem, soma_ideal, soma_real, soma_gap, histograma, atualizado_em)
+    VALUES
+        (p_empresa, p_codrodada, p_email_lider, p_respondentes, p_contagem, p_soma_ideal, p_soma_real, p_soma_gap,
+         p_histograma, now())
+    ON CONFLICT (empresa, codrodada, "emailLider") DO UPDATE SET
+        respondentes = a.respondentes + excluded.respondentes,
+        contagem = somar_vetores(a.contagem, excluded.contagem),
+        soma_ideal = somar_vetores(a.soma_ideal, excluded.soma_ideal),
+        soma_real = somar_vetores(a.soma_real, excluded.soma_real),
+        soma_gap = somar_vetores(a.soma_gap, excluded.soma_gap),
+        histograma = somar_vetores(a.histograma, excluded.histograma),
+        atualizado_em = now();
+    RETURN true;
+END
+$$;
+
+COMMIT;
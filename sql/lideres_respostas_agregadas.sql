@@ -0,0 +1,43 @@
+-- Contagem de respostas por lider e tipo, agrupada no banco.
+--
+-- Usada por /listar-lideres-consolidacao?agregacao=banco no lugar de baixar
+-- todas as linhas de relatorios_microambiente e relatorios_arquetipos. Cada
+-- linha da view e um grupo (origem, codrodada, empresa, emailLider, tipo).
+-- primeiro_id e o menor id do grupo; o servico processa os grupos nessa ordem
+-- para reproduzir exatamente a agregacao linha a linha feita em Python.
+--
+-- SQL portavel: roda igual no Postgres (Supabase) e no SQLite usado por
+-- tests/test_agregacao_lideres.py.
+--
+-- Instalacao no Supabase (SQL editor):
+--   1. execute este arquivo;
+--   2. garanta leitura para a role da API (anon/service_role):
+--        grant select on lideres_respostas_agregadas to anon;
+--   3. recarregue o schema do PostgREST: notify pgrst, 'reload schema';
+
+DROP VIEW IF EXISTS lideres_respostas_agregadas;
+
+CREATE VIEW lideres_respostas_agregadas AS
+SELECT
+    'microambiente' AS origem,
+    codrodada,
+    empresa,
+    "emailLider",
+    tipo,
+    count(*) AS quantidade,
+    min(id) AS primeiro_id
+FROM relatorios_microambiente
+WHERE "emailLider" IS NOT NULL
+GROUP BY codrodada, empresa, "emailLider", tipo
+UNION ALL
+SELECT
+    'arquetipos' AS origem,
+    codrodada,
+    empresa,
+    "emailLider",
+    tipo,
+    count(*) AS quantidade,
+    min(id) AS primeiro_id
+FROM relatorios_arquetipos
+WHERE "emailLider" IS NOT NULL
+GROUP BY codrodada, empresa, "emailLider", tipo;
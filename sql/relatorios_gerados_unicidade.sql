@@ -0,0 +1,35 @@
+-- Unicidade de relatorios_gerados pela chave (empresa, codrodada, emaillider, tipo_relatorio).
+--
+-- Usada pela fila de gravacoes (fila_gravacoes.py): cada lote vira um POST com
+-- on_conflict=empresa,codrodada,emaillider,tipo_relatorio e
+-- Prefer: resolution=merge-duplicates, e uma regeracao atualiza a linha da chave
+-- em vez de inserir outra. Enquanto este arquivo nao for aplicado, o PostgREST
+-- responde 42P10 e a fila grava como insercao, como antes.
+--
+-- Instalacao no Supabase (SQL editor), no projeto dos relatorios:
+--   1. execute este arquivo (uma transacao; pode ser repetido);
+--   2. recarregue o schema do PostgREST: notify pgrst, 'reload schema';
+--
+-- Relatorios sao derivados dos consolidados e podem ser regerados a qualquer
+-- momento: so a versao mais nova de cada chave (maior data_criacao, depois
+-- maior id) e mantida, que e a unica que buscar_ultimo_relatorio_gerado le.
+
+BEGIN;
+
+WITH ordenados AS (
+    SELECT
+        id,
+        row_number() OVER (
+            PARTITION BY empresa, codrodada, emaillider, tipo_relatorio
+            ORDER BY data_criacao DESC, id DESC
+        ) AS posicao
+    FROM relatorios_gerados
+)
+DELETE FROM relatorios_gerados r
+USING ordenados o
+WHERE r.id = o.id AND o.posicao > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS relatorios_gerados_chave
+    ON relatorios_gerados (empresa, codrodada, emaillider, tipo_relatorio);
+
+COMMIT;
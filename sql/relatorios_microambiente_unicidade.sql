@@ -0,0 +1,51 @@
+-- Unicidade das respostas de relatorios_microambiente pela chave natural
+-- (empresa, codrodada, "emailLider", tipo, email) e coluna da chave de idempotencia.
+--
+-- Usada por /enviar-avaliacao: o envio vira um unico POST com
+-- on_conflict=empresa,codrodada,emailLider,tipo,email e
+-- Prefer: resolution=ignore-duplicates, e o banco passa a garantir que um
+-- respondente nao grava duas vezes. Enquanto este arquivo nao for aplicado, o
+-- PostgREST responde 42P10 e a rota volta ao caminho antigo (consulta e insercao).
+--
+-- Instalacao no Supabase (SQL editor), no projeto das respostas:
+--   1. execute este arquivo (uma transacao; pode ser repetido);
+--   2. recarregue o schema do PostgREST: notify pgrst, 'reload schema';
+--
+-- Duplicatas ja gravadas impedem o indice unico. A primeira resposta de cada
+-- chave (menor data_criacao, depois menor id) continua valendo, como em
+-- primeiras_respostas_por_email; as demais sao movidas para
+-- relatorios_microambiente_duplicadas, sem apagar nada de vez.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS relatorios_microambiente_duplicadas AS
+SELECT * FROM relatorios_microambiente WITH NO DATA;
+
+WITH ordenadas AS (
+    SELECT
+        id,
+        row_number() OVER (
+            PARTITION BY empresa, codrodada, "emailLider", tipo, email
+            ORDER BY data_criacao, id
+        ) AS posicao
+    FROM relatorios_microambiente
+),
+movidas AS (
+    DELETE FROM relatorios_microambiente r
+    USING ordenadas o
+    WHERE r.id = o.id AND o.posicao > 1
+    RETURNING r.*
+)
+INSERT INTO relatorios_microambiente_duplicadas
+SELECT * FROM movidas;
+
+-- Chave opcional enviada pelo cliente (Idempotency-Key): um reenvio com a
+-- mesma chave recebe o sucesso original em vez de 409. Nao e unica: quem
+-- garante a unicidade e a chave natural.
+ALTER TABLE relatorios_microambiente ADD COLUMN IF NOT EXISTS chave_idempotencia text;
+ALTER TABLE relatorios_microambiente_duplicadas ADD COLUMN IF NOT EXISTS chave_idempotencia text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS relatorios_microambiente_chave_natural
+    ON relatorios_microambiente (empresa, codrodada, "emailLider", tipo, email);
+
+COMMIT;
@@ -0,0 +1,186 @@
+"""Cliente REST do Supabase (PostgREST) com pool keep-alive, timeouts e retentativa limitada."""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+import metricas_prometheus
+import tempos_requisicao
+
+log = logging.getLogger(__name__)
+
+TIMEOUT_CONEXAO = 5
+TIMEOUT_LEITURA = 30
+MAX_TENTATIVAS = 3
+BACKOFF_BASE = 0.3
+BACKOFF_MAXIMO = 4.0
+
+# GET/HEAD/DELETE podem ser repetidos em qualquer falha transitoria; POST/PATCH
+# so quando o servidor garante que nao processou o pedido (429/503).
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "DELETE"}
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+STATUS_RETENTAVEIS_NAO_IDEMPOTENTES = {429, 503}
+
+
+def _tamanho_pool():
+    try:
+        threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+    except ValueError:
+        threads = 1
+    # Folga para rotas que disparam buscas em paralelo dentro do mesmo request
+    return max(threads, 1) + 4
+
+
+TAMANHO_POOL = _tamanho_pool()
+
+# Um adaptador (e portanto uma pool de conexoes) por processo; cada thread tem a
+# propria Session so para nao compartilhar estado de cookies entre requests.
+_ADAPTADOR = HTTPAdapter(pool_connections=2, pool_maxsize=TAMANHO_POOL, max_retries=0)
+_local = threading.local()
+
+
+def _sessao():
+    sessao = getattr(_local, "sessao", None)
+    if sessao is None:
+        sessao = requests.Session()
+        sessao.mount("https://", _ADAPTADOR)
+        sessao.mount("http://", _ADAPTADOR)
+        _local.sessao = sessao
+    return sessao
+
+
+def _normalizar_timeout(timeout):
+    if timeout is None:
+        return (TIMEOUT_CONEXAO, TIMEOUT_LEITURA)
+    if isinstance(timeout, (int, float)):
+        return (min(TIMEOUT_CONEXAO, timeout), timeout)
+    return timeout
+
+
+def _espera(tentativa, resposta=None):
+    if resposta is not None:
+        retry_after = resposta.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAXIMO)
+    base = min(BACKOFF_BASE * (2 ** (tentativa - 1)), BACKOFF_MAXIMO)
+    return base / 2 + random.uniform(0, base / 2)
+
+
+def _pode_repetir_excecao(metodo, erro):
+    if metodo in METODOS_IDEMPOTENTES:
+        return isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+    # Sem conexao estabelecida o pedido nao chegou ao servidor
+    return isinstance(erro, requests.exceptions.ConnectTimeout)
+
+
+class ClienteSupabase:
+    def __init__(self, url_base, chave):
+        self.url_base = (url_base or "").rstrip("/")
+        self.chave = chave
+
+    def configurado(self):
+        return bool(self.url_base and self.chave)
+
+    def url(self, tabela):
+        return f"{self.url_base}/{tabela}"
+
+    def cabecalhos(self, extras=None):
+        cabecalhos = {
+            "apikey": self.chave,
+            "Authorization": f"Bearer {self.chave}"
+        }
+        if extras:
+            cabecalhos.update(extras)
+        return cabecalhos
+
+    def requisitar(self, metodo, tabela, params=None, json=None, headers=None, timeout=None):
+        metodo = metodo.upper()
+        url = self.url(tabela)
+        cabecalhos = self.cabecalhos(headers)
+        timeout = _normalizar_timeout(timeout)
+        retentaveis = STATUS_RETENTAVEIS if metodo in METODOS_IDEMPOTENTES else STATUS_RETENTAVEIS_NAO_IDEMPOTENTES
+        serie = f"supabase {metodo} {tabela}"
+
+        for tentativa in range(1, MAX_TENTATIVAS + 1):
+            inicio = time.perf_counter()
+            try:
+                resposta = _sessao().request(
+                    metodo, url, params=params, json=json, headers=cabecalhos, timeout=timeout
+                )
+            except requests.exceptions.RequestException as erro:
+                duracao = time.perf_counter() - inicio
+                metricas.registrar_latencia(serie, duracao, erro=True)
+                tempos_requisicao.somar("supabase", duracao)
+                metricas_prometheus.SUPABASE_SEGUNDOS.labels(tabela, metodo, type(erro).__name__).observe(duracao)
+                if tentativa < MAX_TENTATIVAS and _pode_repetir_excecao(metodo, erro):
+                    log.warning("Supabase %s %s: %s, tentativa %s/%s", metodo, tabela, type(erro).__name__,
+                                tentativa, MAX_TENTATIVAS)
+                    time.sleep(_espera(tentativa))
+                    continue
+                raise
+
+            duracao = time.perf_counter() - inicio
+            metricas.registrar_latencia(serie, duracao, erro=resposta.status_code >= 400)
+            tempos_requisicao.somar("supabase", duracao)
+            metricas_prometheus.SUPABASE_SEGUNDOS.labels(tabela, metodo, str(resposta.status_code)).observe(duracao)
+            if tentativa < MAX_TENTATIVAS and resposta.status_code in retentaveis:
+                log.warning("Supabase %s %s: status %s, tentativa %s/%s", metodo, tabela, resposta.status_code,
+                            tentativa, MAX_TENTATIVAS)
+                time.sleep(_espera(tentativa, resposta))
+                continue
+            return resposta
+
+    def get(self, tabela, params=None, **kwargs):
+        return self.requisitar("GET", tabela, params=params, **kwargs)
+
+    def post(self, tabela, json=None, **kwargs):
+        return self.requisitar("POST", tabela, json=json, **kwargs)
+
+    def patch(self, tabela, json=None, **kwargs):
+        return self.requisitar("PATCH", tabela, json=json, **kwargs)
+
+    def delete(self, tabela, **kwargs):
+        return self.requisitar("DELETE", tabela, **kwargs)
+
+    def paginar(self, tabela, params=None, tamanho_pagina=1000, coluna="id", timeout=None):
+        """Gera paginas de linhas por keyset em `coluna` (crescente), sem OFFSET.
+
+        So para quando uma pagina volta vazia, entao um max-rows do PostgREST
+        menor que `tamanho_pagina` nao trunca o resultado.
+        """
+        params = dict(params or {})
+        select = params.get("select")
+        if select and select != "*" and coluna not in select.split(","):
+            params["select"] = f"{select},{coluna}"
+        params["order"] = f"{coluna}.asc"
+        params["limit"] = tamanho_pagina
+
+        ultimo = None
+        while True:
+            params_pagina = dict(params)
+            if ultimo is not None:
+                params_pagina[coluna] = f"gt.{ultimo}"
+            resposta = self.get(tabela, params=params_pagina, timeout=timeout)
+            resposta.raise_for_status()
+            linhas = resposta.json()
+            if not linhas:
+                return
+            yield linhas
+            ultimo = linhas[-1][coluna]
+
+
+def diagnostico():
+    return {
+        "tamanho_pool": TAMANHO_POOL,
+        "timeout_conexao": TIMEOUT_CONEXAO,
+        "timeout_leitura": TIMEOUT_LEITURA,
+        "max_tentativas": MAX_TENTATIVAS,
+        "latencias": {
+            nome: valores for nome, valores in metricas.resumo().items() if nome.startswith("supabase ")
+        }
+    }
@@ -0,0 +1,126 @@
+"""Tempos por fase da requisicao atual (cabecalho Server-Timing) e perfil cProfile opcional."""
+import contextvars
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_atual = contextvars.ContextVar("tempos_requisicao", default=None)
+
+
+class TemposRequisicao:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._fases = {}
+        self._trava = threading.Lock()
+
+    def somar(self, fase, segundos):
+        # Fases podem correr em paralelo (threads de leitura): cada uma soma a propria duracao
+        with self._trava:
+            total, vezes = self._fases.get(fase, (0.0, 0))
+            self._fases[fase] = (total + segundos, vezes + 1)
+
+    def cabecalho(self):
+        with self._trava:
+            fases = dict(self._fases)
+        partes = []
+        for fase, (total, vezes) in fases.items():
+            parte = f"{fase};dur={total * 1000:.1f}"
+            if vezes > 1:
+                parte += f';desc="{vezes}x"'
+            partes.append(parte)
+        partes.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.1f}")
+        return ", ".join(partes)
+
+
+def iniciar():
+    """Abre a contagem da requisicao na thread atual; devolve o token para `encerrar`."""
+    return _atual.set(TemposRequisicao())
+
+
+def atual():
+    return _atual.get()
+
+
+def encerrar(token):
+    _atual.reset(token)
+
+
+def somar(fase, segundos):
+    tempos = _atual.get()
+    if tempos is not None:
+        tempos.somar(fase, segundos)
+
+
+@contextmanager
+def medir(fase):
+    """Soma a duracao do bloco (ou da funcao decorada) na fase da requisicao atual."""
+    tempos = _atual.get()
+    if tempos is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos.somar(fase, time.perf_counter() - inicio)
+
+
+def propagar(funcao):
+    """Envolve `funcao` para rodar em outra thread com o contexto da requisicao atual (fases, id de log)."""
+    contexto = contextvars.copy_context()
+
+    def executar(*args, **kwargs):
+        # Uma copia por chamada: o mesmo Context nao pode estar ativo em duas threads
+        return contexto.copy().run(funcao, *args, **kwargs)
+    return executar
+
+
+# --- Perfil opcional: cabecalho X-Perfil com o segredo de PERFIL_SEGREDO ---
+
+PERFIL_SEGREDO = os.environ.get("PERFIL_SEGREDO", "")
+PERFIL_DIRETORIO = os.environ.get("PERFIL_DIRETORIO", "/tmp/perfis_requisicoes")
+try:
+    PERFIL_AMOSTRAGEM = float(os.environ.get("PERFIL_AMOSTRAGEM", "100"))
+except ValueError:
+    PERFIL_AMOSTRAGEM = 100.0
+
+# Um perfil por processo de cada vez: o cProfile nao aceita dois ativos (Python 3.12+)
+_trava_perfil = threading.Lock()
+
+
+def iniciar_perfil(segredo):
+    """Devolve um cProfile.Profile ja ativo, ou None se o pedido nao deve ser perfilado."""
+    if not PERFIL_SEGREDO or not segredo:
+        return None
+    if not hmac.compare_digest(segredo.encode("utf-8"), PERFIL_SEGREDO.encode("utf-8")):
+        return None
+    if random.random() * 100 >= PERFIL_AMOSTRAGEM:
+        return None
+    if not _trava_perfil.acquire(blocking=False):
+        return None
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        _trava_perfil.release()
+        return None
+    return perfil
+
+
+def encerrar_perfil(perfil, rota):
+    """Desliga o perfil e grava o .prof (abrir com pstats ou snakeviz); devolve o nome do arquivo."""
+    try:
+        perfil.disable()
+    finally:
+        _trava_perfil.release()
+    os.makedirs(PERFIL_DIRETORIO, exist_ok=True)
+    rota = re.sub(r"[^A-Za-z0-9_-]+", "_", rota).strip("_") or "raiz"
+    nome = f"{time.strftime('%Y%m%dT%H%M%S')}_{rota}_{os.getpid()}_{uuid.uuid4().hex[:8]}.prof"
+    perfil.dump_stats(os.path.join(PERFIL_DIRETORIO, nome))
+    return nome
@@ -0,0 +1,133 @@
+"""/listar-lideres-consolidacao: agregacao em Python e pela view lideres_respostas_agregadas dao a mesma listagem.
+
+As duas chamadas passam pela rota e pelo ClienteSupabase.paginar de verdade,
+contra o PostgREST em memoria dos benchmarks. As linhas da view saem de
+sql/lideres_respostas_agregadas.sql rodado num SQLite com as mesmas respostas
+e sao servidas pelo PostgREST em memoria como uma tabela. Fica de fora so o
+proprio PostgREST/Postgres (a view e lida como tabela, sem o SQL no servidor).
+
+Rodar: python -m pytest tests
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+
+import postgrest_falso  # noqa: E402
+
+ARQUIVO_SQL_VIEW = os.path.join(RAIZ, "sql", "lideres_respostas_agregadas.sql")
+COLUNAS = ("id", "codrodada", "empresa", "emailLider", "tipo")
+# Pagina pequena para a leitura por keyset atravessar varias paginas
+TAMANHO_PAGINA = 7
+
+
+def gerar_respostas(tabelas, semente=20240601):
+    aleatorio = random.Random(semente)
+    empresas = ["adm", "ucb", "fastco", "", None]
+    lideres = [f"lider{i}@empresa.com" for i in range(40)] + ["Lider1@Empresa.com", " lider2@empresa.com ", "", None]
+    tipos = ["microambiente_autoavaliacao", "microambiente_equipe", "arquetipos_autoavaliacao", "Avaliacao Equipe",
+             "outro", None]
+    respostas = {}
+    proximo_id = 1
+    for tabela in tabelas:
+        linhas = []
+        for _ in range(3000):
+            linhas.append({
+                "id": proximo_id,
+                "codrodada": aleatorio.choice(["rodada1", "rodada2"]),
+                "empresa": aleatorio.choice(empresas),
+                "emailLider": aleatorio.choice(lideres),
+                "tipo": aleatorio.choice(tipos)
+            })
+            proximo_id += aleatorio.randint(1, 3)
+        respostas[tabela] = linhas
+    return respostas
+
+
+def linhas_da_view(respostas):
+    """Roda o SQL da view num SQLite com as respostas e devolve as linhas da view."""
+    conexao = sqlite3.connect(":memory:")
+    conexao.row_factory = sqlite3.Row
+    for tabela, linhas in respostas.items():
+        conexao.execute(f'CREATE TABLE {tabela} (id INTEGER PRIMARY KEY, codrodada TEXT, empresa TEXT, '
+                        f'"emailLider" TEXT, tipo TEXT)')
+        conexao.executemany(
+            f'INSERT INTO {tabela} (id, codrodada, empresa, "emailLider", tipo) VALUES (?, ?, ?, ?, ?)',
+            [tuple(linha[coluna] for coluna in COLUNAS) for linha in linhas]
+        )
+    with open(ARQUIVO_SQL_VIEW, encoding="utf-8") as arquivo:
+        conexao.executescript(arquivo.read())
+    view = [dict(linha) for linha in conexao.execute("SELECT * FROM lideres_respostas_agregadas")]
+    conexao.close()
+    return view
+
+
+@pytest.fixture(scope="module")
+def servico():
+    diretorio = tempfile.mkdtemp(prefix="teste_agregacao_")
+    os.environ.update({
+        "SUPABASE_REST_URL": "http://postgrest.teste/rest/v1",
+        "SUPABASE_KEY": "teste",
+        "FILA_JOBS_ARQUIVO": os.path.join(diretorio, "fila.sqlite3"),
+        "FILA_JOBS_TRABALHADORES": "0",
+        "ARTEFATOS_DIRETORIO": os.path.join(diretorio, "artefatos"),
+        "LOG_NIVEL": "WARNING"
+    })
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+    banco = postgrest_falso.PostgrestFalso()
+    postgrest_falso.instalar(banco)
+    import app
+
+    respostas = gerar_respostas([tabela for tabela, _ in app.TABELAS_RESPOSTAS_LIDERES])
+    for tabela, linhas in respostas.items():
+        banco.carregar(tabela, linhas)
+    banco.carregar(app.VIEW_AGREGACAO_LIDERES, linhas_da_view(respostas))
+
+    tamanho_original = app.TAMANHO_PAGINA_LIDERES
+    app.TAMANHO_PAGINA_LIDERES = TAMANHO_PAGINA
+    yield app, banco
+    app.TAMANHO_PAGINA_LIDERES = tamanho_original
+
+
+def listar(app, banco, consulta, agregacao):
+    leituras_antes = banco.chamadas[("GET", app.VIEW_AGREGACAO_LIDERES)]
+    resposta = app.app.test_client().get("/listar-lideres-consolidacao", query_string=dict(consulta, agregacao=agregacao))
+    assert resposta.status_code == 200, resposta.get_json()
+    leituras_view = banco.chamadas[("GET", app.VIEW_AGREGACAO_LIDERES)] - leituras_antes
+    return resposta.get_json(), leituras_view
+
+
+@pytest.mark.parametrize("consulta", [
+    {"codrodada": "rodada1"},
+    {"codrodada": "rodada2", "empresa": "adm"},
+    {"codrodada": "rodada1", "holding": "leven"},
+    {"codrodada": "inexistente"}
+], ids=["rodada", "empresa", "holding", "vazia"])
+def test_agregacao_no_banco_igual_a_em_python(servico, consulta):
+    app, banco = servico
+    em_python, leituras_python = listar(app, banco, consulta, "python")
+    no_banco, leituras_banco = listar(app, banco, consulta, "banco")
+
+    # Sem ler a view, a rota teria voltado ao caminho em Python e a comparacao nao provaria nada
+    assert leituras_python == 0
+    assert leituras_banco > 0
+
+    divergencias = [
+        (lider_python, lider_banco)
+        for lider_python, lider_banco in zip(em_python["lideres"], no_banco["lideres"])
+        if lider_python != lider_banco
+    ]
+    assert em_python["total_lideres"] == no_banco["total_lideres"]
+    assert divergencias == []
+    if consulta["codrodada"] == "inexistente":
+        assert no_banco["lideres"] == []
+    else:
+        assert no_banco["lideres"]